@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api.authentication import invalidate_cached_user
+
+        for signal in (post_save, post_delete):
+            signal.connect(
+                invalidate_cached_user, sender=settings.AUTH_USER_MODEL,
+                dispatch_uid='invalidate_cached_user'
+            )
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.timing import measure
+
+ASYNC_READ_ROUTES = (
+    'recipes-list',
+    'recipes-detail',
+    'recipes-get-feed',
+    'recipes-get-changes',
+    'recipes-get-pantry',
+    'recipes-get-similar',
+    'recipes-get-shopping-cart',
+    'recipes-get-shopping-list-job',
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+    'users-get-subscriptions',
+)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_API_THREADS,
+            thread_name_prefix='api-read'
+        )
+    return _executor
+
+
+def _call_with_connections(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            with measure('render'):
+                response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(view, request, *args, **kwargs):
+    """Выполняет синхронную вьюху в пуле потоков для чтения.
+
+    В Django 3.2 нет асинхронного ORM, поэтому запросы к БД,
+    сериализация и рендеринг выполняются в отдельном потоке, а event
+    loop остается свободным. В отличие от sync_to_async по умолчанию,
+    запросы не выстраиваются в очередь к единственному общему потоку.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(
+        contextvars.copy_context().run,
+        _call_with_connections, view, request, *args, **kwargs
+    )
+    return await loop.run_in_executor(get_executor(), call)
+
+
+def async_read(view):
+    """ASGI-вариант DRF-вьюхи для безопасных методов."""
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await run_in_pool(view, request, *args, **kwargs)
+        return await sync_to_async(view)(request, *args, **kwargs)
+
+    return async_view
+
+
+def async_read_urls(urls):
+    """Заменяет вьюхи маршрутов чтения на асинхронные варианты."""
+    return [
+        URLPattern(
+            url.pattern, async_read(url.callback), url.default_args, url.name
+        ) if url.name in ASYNC_READ_ROUTES else url
+        for url in urls
+    ]
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+# Кэши в памяти процесса: сброс из другого воркера до них не доходит.
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def user_cache():
+    """Общий кэш пользователей или None, если кэшировать нельзя."""
+    cache = caches[settings.AUTH_USER_CACHE]
+    if (
+        not settings.AUTH_USER_CACHE_SECONDS
+        or isinstance(cache, PROCESS_LOCAL_CACHES)
+    ):
+        return None
+    return cache
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Сбрасывает кэш при сохранении (и смене пароля) или удалении."""
+    cache = user_cache()
+    if cache is not None:
+        cache.delete(user_cache_key(instance.pk))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация с кэшированием пользователя.
+
+    Пользователь хранится в общем кэше AUTH_USER_CACHE
+    AUTH_USER_CACHE_SECONDS секунд, отзыв токена проверяется по
+    RevokedTokens без запросов к БД. С кэшем в памяти процесса
+    пользователь читается из БД на каждый запрос: деактивация в одном
+    воркере не сбросила бы кэш остальных.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        cache = user_cache()
+        if user_id is None or cache is None:
+            return super().get_user(validated_token)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.AUTH_USER_CACHE_SECONDS)
+        elif not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive'
+            )
+        return user
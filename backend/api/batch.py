@@ -0,0 +1,95 @@
+"""Пакетные изменения избранного и списка покупок.
+
+Пачка рецептов меняется постоянным числом запросов: строки
+добавляются одним bulk_create и удаляются одним DELETE по первичным
+ключам, а список покупок обновляется одним apply_delta вместо
+сигналов на каждую строку корзины. Ответ — статус каждого рецепта
+запроса в его порядке.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from recipes import shopping_list
+from recipes.models import Recipe, ShoppingCart
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+
+
+def unique(ids):
+    return list(dict.fromkeys(ids))
+
+
+def add(model, user, ids):
+    """Добавляет рецепты ids: added, exists или not_found."""
+    ids = unique(ids)
+    found = set(
+        Recipe.objects.filter(id__in=ids).values_list('id', flat=True)
+    )
+    present = set(
+        model.objects.filter(user=user, recipe_id__in=found).values_list(
+            'recipe_id', flat=True
+        )
+    )
+    new = [pk for pk in ids if pk in found and pk not in present]
+    if new:
+        with transaction.atomic():
+            model.objects.bulk_create(
+                model(user=user, recipe_id=pk) for pk in new
+            )
+            if model is ShoppingCart:
+                shopping_list.add_recipes(user.pk, dict.fromkeys(new, 1))
+    new = set(new)
+    return [
+        {
+            'id': pk,
+            'status': (
+                ADDED if pk in new else EXISTS if pk in found else NOT_FOUND
+            )
+        }
+        for pk in ids
+    ]
+
+
+def delete(model, user, rows):
+    """Удаляет строки одним DELETE, возвращает {рецепт: строк}.
+
+    Строки блокируются и удаляются по первичным ключам, чтобы
+    добавленные параллельно не пропали мимо списка покупок.
+    _raw_delete обходит сборщик и сигналы корзины: список покупок
+    обновляется здесь же одним apply_delta.
+    """
+    with transaction.atomic():
+        locked = list(rows.select_for_update().values_list('pk', 'recipe_id'))
+        if not locked:
+            return Counter()
+        batch = model.objects.filter(pk__in=[pk for pk, _ in locked])
+        batch._raw_delete(batch.db)
+        counts = Counter(recipe_id for _, recipe_id in locked)
+        if model is ShoppingCart:
+            shopping_list.remove_recipes(user.pk, counts)
+    return counts
+
+
+def remove(model, user, ids):
+    """Удаляет рецепты ids: removed или missing, если их не было."""
+    ids = unique(ids)
+    counts = delete(
+        model, user, model.objects.filter(user=user, recipe_id__in=ids)
+    )
+    return [
+        {'id': pk, 'status': REMOVED if pk in counts else MISSING}
+        for pk in ids
+    ]
+
+
+def clear(user):
+    """Очищает список покупок пользователя."""
+    counts = delete(
+        ShoppingCart, user, ShoppingCart.objects.filter(user=user)
+    )
+    return [{'id': pk, 'status': REMOVED} for pk in counts]
@@ -0,0 +1,85 @@
+"""Разреженные наборы полей ответа: ?fields=, ?omit= и ?expand=.
+
+?fields=id,name оставляет в ответе только перечисленные поля верхнего
+уровня, ?omit=text — все, кроме перечисленных. Вложенные объекты
+(автор, теги и ингредиенты рецепта, рецепты подписки) по умолчанию
+раскрыты; если передан ?expand=, раскрываются только перечисленные,
+остальные сворачиваются до id. Вьюхи по тем же параметрам пропускают
+ненужные select_related, prefetch и аннотации. Параметры действуют
+только на чтение: запись валидируется полным сериалайзером.
+"""
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+
+def names(request, param):
+    """Имена из ?param=a,b или повторов параметра, None без параметра."""
+    if param not in request.query_params:
+        return None
+    return {
+        name
+        for value in request.query_params.getlist(param)
+        for name in value.split(',') if name
+    }
+
+
+class FieldSelection:
+    """Поля ответа, запрошенные клиентом."""
+
+    def __init__(self, request=None):
+        self.fields = self.omit = self.expand = None
+        if request is not None and request.method in SAFE_METHODS:
+            self.fields = names(request, 'fields')
+            self.omit = names(request, 'omit')
+            self.expand = names(request, 'expand')
+
+    def wants(self, name):
+        return (
+            (self.fields is None or name in self.fields)
+            and (self.omit is None or name not in self.omit)
+        )
+
+    def expands(self, name):
+        return self.wants(name) and (
+            self.expand is None or name in self.expand
+        )
+
+
+def selection(request):
+    """FieldSelection запроса, разобранный один раз."""
+    if request is None:
+        return FieldSelection()
+    chosen = getattr(request, '_field_selection', None)
+    if chosen is None:
+        chosen = request._field_selection = FieldSelection(request)
+    return chosen
+
+
+class SparseFieldsMixin:
+    """Оставляет в ответе верхнего уровня только запрошенные поля.
+
+    collapsed — {поле: фабрика свернутого поля} для вложенных
+    объектов, которые ?expand= может не раскрывать.
+    """
+
+    collapsed = {}
+
+    def is_top_level(self):
+        return self.parent is None or (
+            isinstance(self.parent, ListSerializer)
+            and self.parent.parent is None
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_top_level():
+            return fields
+        chosen = selection(self.context.get('request'))
+        result = {}
+        for name, field in fields.items():
+            if not chosen.wants(name):
+                continue
+            if name in self.collapsed and not chosen.expands(name):
+                field = self.collapsed[name]()
+            result[name] = field
+        return result
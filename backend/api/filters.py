@@ -1,7 +1,15 @@
-from django_filters.rest_framework import (CharFilter, FilterSet,
+from django.conf import settings
+from django.db.models import F
+from django_filters.rest_framework import (BaseInFilter, CharFilter,
+                                           ChoiceFilter, FilterSet,
+                                           NumberFilter,
                                            AllValuesMultipleFilter)
 from recipes.models import Ingredient, Recipe
-from users.models import User
+from rest_framework.exceptions import ValidationError
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    """Список чисел через запятую."""
 
 
 class RecipeFilter(FilterSet):
@@ -11,14 +19,24 @@ class RecipeFilter(FilterSet):
     is_favorited = CharFilter(method='get_is_favorited')
     author = CharFilter(field_name='author__id')
     tags = AllValuesMultipleFilter(field_name='tags__slug')
+    ordering = ChoiceFilter(
+        choices=(('popular', 'popular'), ('trending', 'trending')),
+        method='get_ordering'
+    )
+    ids = NumberInFilter(method='get_ids')
 
     class Meta:
         model = Recipe
-        fields = ('is_in_shopping_cart', 'is_favorited', 'author', 'tags')
+        fields = (
+            'is_in_shopping_cart', 'is_favorited', 'author', 'tags',
+            'ordering', 'ids'
+        )
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if value == '1' and self.request.user.is_authenticated:
-            return self.request.user.recipes_is_in_shopping_cart.all()
+            return queryset.filter(
+                shopping_carts_recipes__user=self.request.user
+            )
         elif value == '0':
             return queryset.filter(is_in_shopping_cart=None)
         else:
@@ -26,12 +44,38 @@ class RecipeFilter(FilterSet):
 
     def get_is_favorited(self, queryset, name, value):
         if value == '1' and self.request.user.is_authenticated:
-            return self.request.user.recipes_is_favorited.all()
+            return queryset.filter(
+                favorite_recipes__user=self.request.user
+            )
         elif value == '0':
             return queryset.filter(is_favorited=None)
         else:
             return queryset
 
+    def get_ordering(self, queryset, name, value):
+        # Рейтинги из RecipeRanking, их пересчитывает refresh_rankings.
+        return queryset.order_by(
+            F(f'ranking__{value}').desc(nulls_last=True), '-pub_date'
+        )
+
+    def filter_queryset(self, queryset):
+        # Пустой ?ids= django-filter не передает в get_ids, а пагинация
+        # для него выключена: без проверки отдалась бы вся таблица.
+        if 'ids' in self.data and not [
+            pk for pk in self.form.cleaned_data['ids'] or () if pk
+        ]:
+            raise ValidationError({'ids': ['Укажите хотя бы один рецепт.']})
+        return super().filter_queryset(queryset)
+
+    def get_ids(self, queryset, name, value):
+        # Несколько рецептов одним запросом, без пагинации
+        # (RecipeViewSet.paginate_queryset).
+        if len(value) > settings.BATCH_MAX_IDS:
+            raise ValidationError({
+                'ids': [f'Не больше {settings.BATCH_MAX_IDS} рецептов.']
+            })
+        return queryset.filter(id__in=[pk for pk in value if pk])
+
 
 class IngredientFilter(FilterSet):
     """Фильтрация ингредиентов."""
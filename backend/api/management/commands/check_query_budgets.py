@@ -0,0 +1,227 @@
+import json
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from django.utils import timezone
+
+from api import urls
+from api.paginations import SyncPagination
+from api.query_budgets import QUERY_BUDGETS
+from api.tokens import CustomAccessToken
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, RecipeTombstone, ShoppingCart,
+                            ShoppingListJob, Tag)
+from recipes.similar import build as build_similar
+from recipes.view_counts import view_counter
+from users.models import Follow, User
+
+PASSWORD = 'budget-password-1'
+AUTHORS = 6
+ADMIN_APPS = ('recipes', 'users')
+
+
+def route_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from route_names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
+
+
+def admin_changelists():
+    """Имена списков админки и есть ли в них поиск."""
+    for model, model_admin in admin.site._registry.items():
+        opts = model._meta
+        if opts.app_label in ADMIN_APPS:
+            yield (
+                f'admin:{opts.app_label}_{opts.model_name}_changelist',
+                bool(model_admin.search_fields)
+            )
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все маршруты api/urls.py и списки объектов админки на '
+        'тестовой БД и проверяет бюджеты SQL-запросов из '
+        'api/query_budgets.py и отсутствие N+1.'
+    )
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            # Без задержки синхронизации только что созданные рецепты
+            # попадают в /api/recipes/changes/.
+            with override_settings(QUERY_CHECKS='raise', SYNC_LAG_SECONDS=0):
+                failures = self.check_budgets()
+            # Просмотры тестовых запросов пишутся в тестовую БД, а не
+            # в рабочую при выходе из процесса.
+            view_counter.flush()
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Бюджеты запросов соблюдены.'))
+
+    def create_fixtures(self):
+        user = User.objects.create_user(
+            username='budget', email='budget@example.com', password=PASSWORD,
+            first_name='Budget', last_name='Budget'
+        )
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        for number in range(AUTHORS):
+            author = User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                password=PASSWORD
+            )
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipes/images/budget.png'
+            )
+            recipe.tags.set([tag])
+            IngredientAmount.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+            Follow.objects.create(user=user, following=author)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            if number < AUTHORS - 1:
+                # Для списка избранного в админке; последний рецепт
+                # добавляет в избранное и удаляет из него пользователь.
+                FavoriteRecipe.objects.create(user=author, recipe=recipe)
+        job = ShoppingListJob.objects.create(user=user, cart_hash='')
+        RecipeTombstone.objects.create(recipe_id=0, deleted=timezone.now())
+        build_similar()
+        return user, author, recipe, tag, ingredient, job
+
+    def get_requests(self, user, author, recipe, tag, ingredient, job):
+        ids = {'ids': list(Recipe.objects.values_list('id', flat=True))}
+        return (
+            ('GET', 'tags-list', {}, None),
+            ('GET', 'tags-detail', {'pk': tag.pk}, None),
+            ('GET', 'ingredients-list', {}, None),
+            ('GET', 'ingredients-detail', {'id': ingredient.pk}, None),
+            ('GET', 'recipes-list', {}, None),
+            ('GET', 'recipes-list', {}, {
+                'ids': ','.join(map(str, ids['ids']))
+            }),
+            ('GET', 'recipes-list', {}, {
+                'fields': 'id,name,image,cooking_time'
+            }),
+            ('GET', 'recipes-list', {}, {'expand': 'author'}),
+            ('GET', 'recipes-list', {}, {'is_favorited': 1}),
+            ('GET', 'recipes-list', {}, {'is_in_shopping_cart': 1}),
+            ('GET', 'recipes-detail', {'pk': recipe.pk}, None),
+            ('GET', 'recipes-get-feed', {}, None),
+            ('GET', 'recipes-get-changes', {}, None),
+            ('GET', 'recipes-get-changes', {}, {
+                'since': SyncPagination().encode_position(
+                    (timezone.now() - timedelta(days=1), 0)
+                )
+            }),
+            ('GET', 'recipes-get-pantry', {}, {
+                'ingredients': ingredient.pk
+            }),
+            ('GET', 'recipes-get-similar', {'pk': recipe.pk}, None),
+            ('GET', 'recipes-get-shopping-cart', {}, None),
+            ('GET', 'recipes-get-shopping-list-job', {'job_id': job.pk}, None),
+            ('GET', 'users-list', {}, None),
+            ('GET', 'users-detail', {'pk': author.pk}, None),
+            ('GET', 'users-get-data-me', {}, None),
+            ('GET', 'users-get-subscriptions', {}, None),
+            ('GET', 'users-get-subscriptions', {}, {'expand': ''}),
+            ('DELETE', 'users-subscribe', {'pk': author.pk}, None),
+            ('POST', 'users-subscribe', {'pk': author.pk}, None),
+            ('DELETE', 'shopping_cart', {'recipe_id': recipe.pk}, None),
+            ('POST', 'shopping_cart', {'recipe_id': recipe.pk}, None),
+            ('POST', 'favorite_recipe', {'recipe_id': recipe.pk}, None),
+            ('DELETE', 'favorite_recipe', {'recipe_id': recipe.pk}, None),
+            ('DELETE', 'recipes-shopping-cart-batch', {}, ids),
+            ('POST', 'recipes-shopping-cart-batch', {}, ids),
+            ('POST', 'recipes-favorite-batch', {}, ids),
+            ('DELETE', 'recipes-favorite-batch', {}, ids),
+            ('DELETE', 'recipes-clear-shopping-cart', {}, None),
+            ('POST', 'users-change-password', {}, {
+                'current_password': PASSWORD, 'new_password': PASSWORD
+            }),
+            ('POST', 'users-list', {}, {
+                'email': 'new@example.com', 'username': 'new',
+                'first_name': 'New', 'last_name': 'New',
+                'password': PASSWORD
+            }),
+            ('POST', 'token_obtain_pair', {}, {
+                'email': user.email, 'password': PASSWORD
+            }),
+            ('POST', 'logout', {}, None),
+        )
+
+    def check_budgets(self):
+        fixtures = self.create_fixtures()
+        requests = self.get_requests(*fixtures)
+        token = f'Token {CustomAccessToken.for_user(fixtures[0])}'
+        client = Client(HTTP_AUTHORIZATION=token)
+        failures = [
+            f'Нет запроса для маршрута {name}.'
+            for name in sorted(
+                set(route_names(urls.urlpatterns))
+                - {name for _, name, _, _ in requests}
+            )
+        ]
+        failures.extend(
+            f'Нет бюджета для {method} {name}.'
+            for method, name, _, _ in requests
+            if (method, name) not in QUERY_BUDGETS
+        )
+        for method, name, kwargs, data in requests:
+            url = reverse(name, kwargs=kwargs)
+            if method == 'GET' and data:
+                url, data = f'{url}?{urlencode(data)}', None
+            failures.extend(
+                self.check_request(client, method, name, url, data)
+            )
+        admin_client = Client()
+        admin_client.force_login(User.objects.create_superuser(
+            username='budget-admin', email='budget-admin@example.com',
+            password=PASSWORD
+        ))
+        for name, searchable in admin_changelists():
+            if ('GET', name) not in QUERY_BUDGETS:
+                failures.append(f'Нет бюджета для GET {name}.')
+            pages = [reverse(name)]
+            if searchable:
+                # Поиск выключает оценку числа строк и фильтрует COUNT.
+                pages.append(f'{reverse(name)}?q=budget')
+            for url in pages:
+                failures.extend(
+                    self.check_request(admin_client, 'GET', name, url)
+                )
+        return failures
+
+    def check_request(self, client, method, name, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            try:
+                response = client.generic(
+                    method, url, json.dumps(data) if data else '',
+                    content_type='application/json'
+                )
+            except Exception as error:
+                return [f'{method} {url}: {error}']
+        self.stdout.write(
+            f'{method:7}{url:40}{response.status_code:>5}'
+            f'{len(queries):>5} / {QUERY_BUDGETS.get((method, name))}'
+        )
+        if response.status_code >= 500:
+            return [f'{method} {url}: {response.status_code}']
+        return []
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет истекшие токены из OutstandingToken и BlacklistedToken '
+        'порциями и выводит размеры таблиц. Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Пауза между порциями в секундах.'
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Только вывести статистику.'
+        )
+
+    def handle(self, *args, **options):
+        self.print_stats()
+        if options['stats']:
+            return
+        deleted = self.prune(options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено истекших токенов: {deleted}.'
+        ))
+        self.print_stats()
+
+    def prune(self, batch_size, pause):
+        """Удаляет истекшие токены короткими транзакциями.
+
+        Отозванные записи удаляются вместе с токеном через CASCADE.
+        """
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(
+                    expires_at__lte=now
+                ).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            time.sleep(pause)
+
+    def print_stats(self):
+        now = timezone.now()
+        stats = (
+            ('выдано токенов', OutstandingToken.objects.count()),
+            ('из них истекли', OutstandingToken.objects.filter(
+                expires_at__lte=now
+            ).count()),
+            ('отозвано', BlacklistedToken.objects.count()),
+        )
+        for title, value in stats:
+            self.stdout.write(f'{title}: {value}')
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            for model in (OutstandingToken, BlacklistedToken):
+                cursor.execute(
+                    'SELECT pg_size_pretty(pg_total_relation_size(%s))',
+                    [model._meta.db_table]
+                )
+                self.stdout.write(
+                    f'{model._meta.db_table}: {cursor.fetchone()[0]}'
+                )
@@ -0,0 +1,88 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from api.shopping_list import run_job
+from recipes.models import ShoppingListJob
+
+logger = logging.getLogger('foodgram.shopping_lists')
+
+# Сборка, начатая раньше, считается брошенной упавшим воркером.
+STALE_MINUTES = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер очереди ShoppingListJob: собирает PDF списков покупок, '
+        'поставленные вьюхой загрузки в фоновом режиме.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и выйти.'
+        )
+        parser.add_argument('--interval', type=float, default=1)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = self.claim()
+            if job is not None:
+                self.run(job)
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
+
+    def requeue_stale(self):
+        """Возвращает в очередь сборки упавших воркеров."""
+        stale = timezone.now() - timedelta(minutes=STALE_MINUTES)
+        # Задачи, взятые до появления started, судятся по created.
+        requeued = ShoppingListJob.objects.filter(
+            Q(started__lt=stale) | Q(started__isnull=True, created__lt=stale),
+            status=ShoppingListJob.RUNNING
+        ).update(status=ShoppingListJob.PENDING)
+        if requeued:
+            logger.warning('Возвращено в очередь сборок: %s', requeued)
+
+    def claim(self):
+        """Берет задачу из очереди.
+
+        Брошенные сборки проверяются на каждом проходе: воркер,
+        перезапущенный сразу после падения, дождется их устаревания.
+        Условный UPDATE атомарен, поэтому несколько воркеров не
+        получат одну задачу, и select_for_update не нужен.
+        """
+        self.requeue_stale()
+        pending = ShoppingListJob.objects.filter(
+            status=ShoppingListJob.PENDING
+        ).order_by('created')
+        for job in pending[:10]:
+            if ShoppingListJob.objects.filter(
+                pk=job.pk, status=ShoppingListJob.PENDING
+            ).update(
+                status=ShoppingListJob.RUNNING, started=timezone.now()
+            ):
+                job.status = ShoppingListJob.RUNNING
+                return job
+        return None
+
+    def run(self, job):
+        started = time.perf_counter()
+        try:
+            run_job(job)
+        except Exception:
+            logger.exception('Сборка %s не удалась', job.pk)
+            ShoppingListJob.objects.filter(pk=job.pk).update(
+                status=ShoppingListJob.FAILED, finished=timezone.now()
+            )
+            return
+        self.stdout.write(
+            f'{job.pk}: {time.perf_counter() - started:.2f} с'
+        )
@@ -1,5 +1,151 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import (b64decode, b64encode, urlsafe_b64decode,
+                    urlsafe_b64encode)
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.status import HTTP_410_GONE
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.feed import read_feed
+from recipes.sync import changes, expired
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class FeedPagination(BasePagination):
+    """Курсорная пагинация ленты: ?cursor= из ссылки next и ?limit=.
+
+    Курсор — дата и id последнего рецепта страницы, поэтому новые
+    рецепты не сдвигают следующие страницы.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        value = request.query_params.get(self.cursor_query_param)
+        if not value:
+            return None
+        try:
+            date, pk = b64decode(value.encode()).decode().split('|')
+            return datetime.fromisoformat(date), int(pk)
+        except ValueError:
+            raise NotFound('Неверный курсор.')
+
+    def encode_cursor(self, request, row):
+        date, pk = row
+        value = b64encode(f'{date.isoformat()}|{pk}'.encode()).decode()
+        return replace_query_param(
+            request.build_absolute_uri(), self.cursor_query_param, value
+        )
+
+    def paginate_feed(self, request, user):
+        """id рецептов страницы ленты пользователя."""
+        rows, has_next = read_feed(
+            user, self.get_page_size(request), self.decode_cursor(request)
+        )
+        self.next = (
+            self.encode_cursor(request, rows[-1]) if has_next else None
+        )
+        return [pk for _, pk in rows]
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.next, 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class SyncPagination(FeedPagination):
+    """Страницы изменений рецептов: ?since= из прошлого ответа и ?limit=.
+
+    Позиция кодируется так же, как курсор ленты. Клиент сохраняет
+    since из ответа и переходит по next, пока он не пуст.
+    """
+
+    cursor_query_param = 'since'
+    page_size = 100
+    max_page_size = 500
+
+    def encode_position(self, position):
+        # urlsafe: токен передается в ?since= как есть.
+        date, pk = position
+        return urlsafe_b64encode(f'{date.isoformat()}|{pk}'.encode()).decode()
+
+    def decode_cursor(self, request):
+        value = request.query_params.get(self.cursor_query_param)
+        if not value:
+            return None
+        try:
+            date, pk = urlsafe_b64decode(value.encode()).decode().split('|')
+            date, pk = datetime.fromisoformat(date), int(pk)
+        except ValueError:
+            raise NotFound('Неверный курсор.')
+        if date.tzinfo is None:
+            raise NotFound('Неверный курсор.')
+        return date, pk
+
+    def paginate_changes(self, request, recipes):
+        """Измененные рецепты страницы, id удаленных — в self.deleted.
+
+        None, если позиция старше хранимых надгробий.
+        """
+        position = self.decode_cursor(request)
+        if position is not None and expired(position):
+            return None
+        page, self.deleted, position, has_next = changes(
+            recipes, position, self.get_page_size(request)
+        )
+        self.since = self.encode_position(position)
+        self.next = (
+            replace_query_param(
+                request.build_absolute_uri(), self.cursor_query_param,
+                self.since
+            )
+            if has_next else None
+        )
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'changed': data,
+            'deleted': self.deleted,
+            'since': self.since,
+            'next': self.next,
+        })
+
+    def get_expired_response(self):
+        return Response(
+            {'message': 'Позиция устарела, нужна полная синхронизация.'},
+            status=HTTP_410_GONE
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'changed': schema,
+                'deleted': {'type': 'array', 'items': {'type': 'integer'}},
+                'since': {'type': 'string'},
+                'next': {'type': 'string', 'nullable': True},
+            },
+        }
@@ -0,0 +1,45 @@
+"""PDF-версия списка покупок.
+
+Модуль тянет reportlab, поэтому импортируется только внутри вьюхи
+загрузки списка, а не при старте воркера.
+"""
+from io import BytesIO
+from pathlib import Path
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+
+FONT_NAME = 'Aerial'
+FONT_PATH = Path(__file__).resolve().parent / 'Aerial.ttf'
+FONT_SIZE = 16
+X_OFFSET = 100
+Y_START = 800
+Y_STEP = 20
+
+
+def register_font():
+    """Регистрирует шрифт один раз на процесс."""
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def render_shopping_list(lines):
+    """PDF со строками списка покупок."""
+    register_font()
+    buffer = BytesIO()
+    p = Canvas(buffer, pagesize=A4)
+    p.setFont(FONT_NAME, FONT_SIZE)
+    y_offset = Y_START
+    for line in lines:
+        p.drawString(X_OFFSET, y_offset, line)
+        y_offset -= Y_STEP
+        if y_offset <= Y_STEP:
+            p.showPage()
+            p.setFont(FONT_NAME, FONT_SIZE)
+            y_offset = Y_START
+    p.showPage()
+    p.save()
+    buffer.seek(0)
+    return buffer
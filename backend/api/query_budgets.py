@@ -0,0 +1,51 @@
+"""Бюджеты SQL-запросов для эндпоинтов API и списков админки.
+
+Ключ — метод и имя маршрута из api/urls.py или админки, значение —
+максимум запросов к БД для авторизованного пользователя, включая два
+запроса аутентификации по токену или сессии. Проверяются командой
+check_query_budgets и ServerTimingMiddleware при QUERY_CHECKS != 'off'.
+Списки админки больших таблиц на PostgreSQL делают на запрос больше:
+оценку числа строк по pg_class перед COUNT(*) маленькой таблицы.
+"""
+
+QUERY_BUDGETS = {
+    ('GET', 'tags-list'): 3,
+    ('GET', 'tags-detail'): 3,
+    ('GET', 'ingredients-list'): 3,
+    ('GET', 'ingredients-detail'): 3,
+    ('GET', 'recipes-list'): 8,
+    ('GET', 'recipes-detail'): 7,
+    ('GET', 'recipes-get-feed'): 7,
+    ('GET', 'recipes-get-changes'): 7,
+    ('GET', 'recipes-get-pantry'): 6,
+    ('GET', 'recipes-get-similar'): 4,
+    ('GET', 'recipes-get-shopping-cart'): 3,
+    ('GET', 'recipes-get-shopping-list-job'): 3,
+    ('GET', 'users-list'): 4,
+    ('GET', 'users-detail'): 3,
+    ('GET', 'users-get-data-me'): 2,
+    ('GET', 'users-get-subscriptions'): 5,
+    ('POST', 'users-subscribe'): 9,
+    ('DELETE', 'users-subscribe'): 7,
+    ('POST', 'shopping_cart'): 8,
+    ('DELETE', 'shopping_cart'): 7,
+    ('POST', 'favorite_recipe'): 6,
+    ('DELETE', 'favorite_recipe'): 4,
+    ('POST', 'recipes-favorite-batch'): 6,
+    ('DELETE', 'recipes-favorite-batch'): 5,
+    ('POST', 'recipes-shopping-cart-batch'): 9,
+    ('DELETE', 'recipes-shopping-cart-batch'): 7,
+    ('DELETE', 'recipes-clear-shopping-cart'): 7,
+    ('POST', 'users-change-password'): 3,
+    ('POST', 'users-list'): 6,
+    ('POST', 'token_obtain_pair'): 3,
+    ('POST', 'logout'): 5,
+    ('GET', 'admin:recipes_tag_changelist'): 8,
+    ('GET', 'admin:recipes_recipe_changelist'): 6,
+    ('GET', 'admin:recipes_ingredient_changelist'): 6,
+    ('GET', 'admin:recipes_ingredientamount_changelist'): 5,
+    ('GET', 'admin:recipes_favoriterecipe_changelist'): 5,
+    ('GET', 'admin:recipes_shoppingcart_changelist'): 5,
+    ('GET', 'admin:users_follow_changelist'): 5,
+    ('GET', 'admin:users_user_changelist'): 5,
+}
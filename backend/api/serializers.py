@@ -1,11 +1,26 @@
+from api.fields import SparseFieldsMixin
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
                             Recipe, ShoppingCart, Tag)
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.shortcuts import get_object_or_404
+from foodgram.timing import measure
+from recipes import shopping_list
+from recipes.deletion import delete_files
 from rest_framework import serializers
 from users.models import User
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Учет времени сериализации в Server-Timing."""
+
+    def to_representation(self, instance):
+        with measure('serializer'):
+            return super().to_representation(instance)
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериалайзер для модели Tag."""
 
     class Meta:
@@ -13,7 +28,7 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериалайзер для модели Ingredient."""
 
     class Meta:
@@ -24,12 +39,19 @@ class IngredientSerializer(serializers.ModelSerializer):
 class IngredientAmountSerializer(serializers.ModelSerializer):
     """Сериалайзер для добавления ингредиентов в рецепт."""
 
-    id = serializers.IntegerField()
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name', read_only=True)
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit',
+        read_only=True
+    )
 
     class Meta:
         model = IngredientAmount
         fields = (
             'id',
+            'name',
+            'measurement_unit',
             'amount'
         )
 
@@ -41,6 +63,16 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         return data
 
 
+class IngredientAmountIdSerializer(serializers.ModelSerializer):
+    """Ингредиент рецепта, свернутый до id и количества."""
+
+    id = serializers.IntegerField(source='ingredient_id', read_only=True)
+
+    class Meta:
+        model = IngredientAmount
+        fields = ('id', 'amount')
+
+
 class Base64ImageField(serializers.ImageField):
     """Отображение картинок."""
 
@@ -76,7 +108,9 @@ class Base64ImageField(serializers.ImageField):
         return extension
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(
+    SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериалайзер пользоватлея."""
 
     is_subscribed = serializers.BooleanField(read_only=True)
@@ -105,9 +139,23 @@ class TagPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
         }
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(
+    SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериалайзер для модели Recipe."""
 
+    collapsed = {
+        'author': lambda: serializers.IntegerField(
+            source='author_id', read_only=True
+        ),
+        'tags': lambda: serializers.PrimaryKeyRelatedField(
+            many=True, read_only=True
+        ),
+        'ingredients': lambda: IngredientAmountIdSerializer(
+            source='amount_recipes', many=True, read_only=True
+        ),
+    }
+
     author = UserSerializer(read_only=True)
     tags = TagPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
@@ -116,6 +164,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         allow_empty=False
     )
     ingredients = IngredientAmountSerializer(
+        source='amount_recipes',
         many=True,
         required=True,
         allow_empty=False
@@ -135,9 +184,12 @@ class RecipeSerializer(serializers.ModelSerializer):
             'name',
             'image',
             'text',
-            'cooking_time'
+            'cooking_time',
+            'views'
+        )
+        read_only_fields = (
+            'id', 'author', 'is_favorited', 'is_in_shopping_cart', 'views'
         )
-        read_only_fields = ('id', 'author', 'is_favorited', 'is_in_shopping_cart')
         model = Recipe
 
     def validate_cooking_time(self, value):
@@ -152,49 +204,64 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Повторяющиеся теги.')
         return value
 
+    def validate_ingredients(self, value):
+        keys = [sub['ingredient_id'] for sub in value]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError(
+                'Повторяющиеся ингредиенты.'
+            )
+        if Ingredient.objects.filter(id__in=keys).count() != len(keys):
+            raise serializers.ValidationError(
+                'Ингредиент не найден.'
+            )
+        return value
+
+    def set_ingredients(self, instance, ingredients):
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=instance, **ingredient)
+            for ingredient in ingredients
+        )
+        prefetch_related_objects([instance], 'amount_recipes__ingredient')
+
     def create(self, validated_data):
         tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        ingredients = validated_data.pop('amount_recipes')
         instance = Recipe.objects.create(**validated_data)
         instance.tags.set(tags)
-        ingredients_ids = []
-        for ingredient in ingredients:
-            ingredients_ids.append(
-                IngredientAmount.objects.get_or_create(
-                    **ingredient
-                )[0].pk
-            )
-        instance.ingredients.set(ingredients_ids)
+        self.set_ingredients(instance, ingredients)
         return instance
 
     def update(self, instance, validated_data):
-        if 'ingredients' not in validated_data:
+        if 'amount_recipes' not in validated_data:
             raise serializers.ValidationError('Не добавлены ингредиенты.')
         if 'tags' not in validated_data:
             raise serializers.ValidationError('Не добавлены теги.')
         tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        ingredients = validated_data.pop('amount_recipes')
+        old_image = instance.image.name
         instance.tags.set(tags)
-        ingredients_ids = []
-        for ingredient in ingredients:
-            ingredients_ids.append(
-                IngredientAmount.objects.get_or_create(
-                    **ingredient
-                )[0].pk
-            )
-        instance.ingredients.set(ingredients_ids)
+        with transaction.atomic():
+            users = shopping_list.carting_users(instance.pk)
+            old = {}
+            if users:
+                old = shopping_list.recipe_amounts(instance.pk)
+            instance.amount_recipes.all().delete()
+            self.set_ingredients(instance, ingredients)
+            if users:
+                shopping_list.change_recipe(
+                    users, old,
+                    shopping_list.amounts_of(instance.amount_recipes.all())
+                )
         super(self.__class__, self).update(instance, validated_data)
         instance.save()
+        if old_image and instance.image.name != old_image:
+            # Прежний файл удаляется, если на него не ссылаются другие
+            # рецепты: одинаковые картинки хранятся одним файлом.
+            transaction.on_commit(
+                lambda: delete_files(Recipe, {'image': {old_image}})
+            )
         return instance
 
-    # def validate_ingredients(self, value):
-    #     keys = [sub['id'] for sub in value]
-    #     if len(set(keys)) != len(keys):
-    #         raise serializers.ValidationError(
-    #             'Повторяющиеся ингредиенты.'
-    #         )
-    #     return value
-
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
     """Сериалайзер для списка покупок."""
@@ -249,7 +316,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         user = request.user
         recipe_id = self.context.get('view').kwargs.get('recipe_id')
-        recipe = get_object_or_404(id=recipe_id)
+        recipe = get_object_or_404(Recipe, id=recipe_id)
         if request.method == 'POST':
             if recipe.favorite_recipes.filter(user=user, recipe=recipe):
                 raise serializers.ValidationError(
@@ -303,10 +370,12 @@ class TokenSerializer(serializers.Serializer):
 
     def validate(self, data):
         user = get_object_or_404(User, email=data['email'])
+        # Пароль, сохраненный устаревшим хешером, пересчитывается здесь.
         if not user.check_password(data['password']):
             raise serializers.ValidationError(
                 'Неверный пароль!'
             )
+        data['user'] = user
         return data
 
 
@@ -317,7 +386,7 @@ class ChangePasswordSerializer(serializers.Serializer):
     current_password = serializers.CharField(max_length=150)
 
 
-class RecipeUserSerializer(serializers.ModelSerializer):
+class RecipeUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Рецепты в подписках."""
 
     class Meta:
@@ -330,9 +399,40 @@ class RecipeUserSerializer(serializers.ModelSerializer):
         model = Recipe
 
 
-class SubscriptionsSerializer(serializers.ModelSerializer):
+class PantrySerializer(serializers.Serializer):
+    """Параметры поиска рецептов по имеющимся ингредиентам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500
+    )
+    max_missing = serializers.IntegerField(
+        min_value=0, max_value=20, default=2
+    )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Пачка рецептов для пакетных изменений избранного и корзины."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_IDS
+    )
+
+
+class SubscriptionsSerializer(
+    SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериалайзер для подписок."""
 
+    collapsed = {
+        'recipes': lambda: serializers.SerializerMethodField(
+            method_name='get_recipe_ids'
+        ),
+    }
+
     recipes = serializers.SerializerMethodField(read_only=True)
     recipes_count = serializers.IntegerField(read_only=True)
     is_subscribed = serializers.BooleanField(read_only=True)
@@ -350,12 +450,20 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
         )
         model = User
 
-    def get_recipes(self, obj):
+    def limited_recipes(self, obj):
         recipes_limit = self.context.get(
             'request'
         ).query_params.get('recipes_limit')
-        recipes = obj.recipes.order_by('-pub_date')
+        recipes = obj.recipes.all()
         if recipes_limit:
             recipes = recipes[:int(recipes_limit)]
-        serializer = RecipeUserSerializer(instance=recipes, many=True)
+        return recipes
+
+    def get_recipes(self, obj):
+        serializer = RecipeUserSerializer(
+            instance=self.limited_recipes(obj), many=True
+        )
         return serializer.data
+
+    def get_recipe_ids(self, obj):
+        return [recipe.id for recipe in self.limited_recipes(obj)]
@@ -0,0 +1,201 @@
+"""Выгрузка списка покупок: PDF и легкие потоковые форматы.
+
+Формат выбирается стандартным согласованием DRF: ?format=txt или
+заголовком Accept. Рендереры здесь только помечают форматы и
+отдают ошибки, сам файл собирает вьюха. Большие PDF при
+SHOPPING_LIST_BACKGROUND собираются в фоне командой
+run_shopping_list_jobs.
+"""
+import csv
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.http import FileResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_202_ACCEPTED
+
+from recipes.models import ShoppingListItem, ShoppingListJob
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json; charset=utf-8'
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class PdfRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class TextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CsvRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JsonRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+
+# PDF первым: его получают клиенты без Accept, как и раньше.
+RENDERERS = (PdfRenderer, TextRenderer, CsvRenderer, JsonRenderer)
+
+
+def get_rows(user):
+    """Строки списка покупок: ингредиент, единица и сумма.
+
+    Читаются из материализованного списка пользователя.
+    """
+    return list(ShoppingListItem.objects.filter(
+        user=user, recipes__gt=0
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total=F('amount')
+    ).order_by('ingredient__name'))
+
+
+def fingerprint(rows):
+    """Отпечаток содержимого списка для повторного использования PDF."""
+    return hashlib.sha1(
+        json.dumps(rows, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def format_line(row):
+    return (
+        f"{row['ingredient__name']} "
+        f"({row['ingredient__measurement_unit']}): {row['total']}"
+    )
+
+
+class Echo:
+    """Файловый объект для csv.writer, возвращающий записанное."""
+
+    def write(self, value):
+        return value
+
+
+def stream_txt(rows):
+    for row in rows:
+        yield format_line(row) + '\n'
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow((
+            row['ingredient__name'],
+            row['ingredient__measurement_unit'],
+            row['total']
+        ))
+
+
+def stream_json(rows):
+    yield '['
+    for number, row in enumerate(rows):
+        yield (', ' if number else '') + json.dumps({
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['total'],
+        }, ensure_ascii=False)
+    yield ']'
+
+
+STREAMS = {'txt': stream_txt, 'csv': stream_csv, 'json': stream_json}
+
+
+def wants_background(request, rows):
+    """Собирать ли PDF в фоне: большой список или Prefer: respond-async."""
+    if not settings.SHOPPING_LIST_BACKGROUND:
+        return False
+    return (
+        len(rows) >= settings.SHOPPING_LIST_BACKGROUND_ROWS
+        or 'respond-async' in request.headers.get('Prefer', '')
+    )
+
+
+def find_or_enqueue(user, rows):
+    """Сборка для текущего содержимого списка, новая при изменениях."""
+    cart_hash = fingerprint(rows)
+    job = ShoppingListJob.objects.filter(
+        user=user, cart_hash=cart_hash
+    ).exclude(
+        status=ShoppingListJob.FAILED
+    ).order_by('-created').first()
+    if job is not None and file_lost(job):
+        job.delete()
+        job = None
+    if job is None:
+        job = ShoppingListJob.objects.create(user=user, cart_hash=cart_hash)
+    return job
+
+
+def file_lost(job):
+    """Готовый файл пропал из хранилища, например при смене тома."""
+    return (
+        job.status == ShoppingListJob.DONE
+        and not job.file.storage.exists(job.file.name)
+    )
+
+
+def pdf_response(file):
+    return FileResponse(
+        file, as_attachment=True, filename='shopping_cart.pdf'
+    )
+
+
+def job_response(request, job):
+    """Готовый файл или статус сборки со ссылкой для проверки."""
+    if file_lost(job):
+        job.status = ShoppingListJob.FAILED
+        job.save(update_fields=('status',))
+    if job.status == ShoppingListJob.DONE:
+        return pdf_response(job.file.open('rb'))
+    url = request.build_absolute_uri(reverse(
+        'recipes-get-shopping-list-job', kwargs={'job_id': job.pk}
+    ))
+    return Response(
+        {'id': str(job.pk), 'status': job.status, 'url': url},
+        status=(
+            HTTP_200_OK if job.status == ShoppingListJob.FAILED
+            else HTTP_202_ACCEPTED
+        ),
+        headers={'Location': url}
+    )
+
+
+def run_job(job):
+    """Собирает PDF задачи и удаляет прошлые результаты пользователя."""
+    from api.pdf import render_shopping_list
+
+    rows = get_rows(job.user_id)
+    job.cart_hash = fingerprint(rows)
+    buffer = render_shopping_list(map(format_line, rows))
+    job.file.save(f'{job.pk}.pdf', ContentFile(buffer.getvalue()), save=False)
+    job.status = ShoppingListJob.DONE
+    job.finished = timezone.now()
+    job.save()
+    for old in ShoppingListJob.objects.filter(
+        user_id=job.user_id,
+        status__in=(ShoppingListJob.DONE, ShoppingListJob.FAILED)
+    ).exclude(pk=job.pk):
+        old.file.delete(save=False)
+        old.delete()
@@ -0,0 +1,160 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+LOCK_SECONDS = 1
+
+_backends = {}
+
+
+def parse_rate(rate):
+    """'10/min' -> (емкость корзины, токенов в секунду)."""
+    count, period = rate.split('/')
+    return int(count), int(count) / DURATIONS[period[0]]
+
+
+def spend(state, capacity, refill_rate, cost, now):
+    """Новое состояние корзины (токены, время) и ожидание в секундах."""
+    tokens, updated = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+    cost = min(cost, capacity)
+    if tokens >= cost:
+        return (tokens - cost, now), 0
+    return (tokens, now), (cost - tokens) / refill_rate
+
+
+class LocalBucketBackend:
+    """Корзины в памяти процесса: для тестов и одного воркера."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        with self._lock:
+            self._buckets[key], wait = spend(
+                self._buckets.get(key), capacity, refill_rate, cost,
+                time.monotonic()
+            )
+        return wait
+
+
+class CacheBucketBackend:
+    """Корзины в общем кэше RATE_LIMIT_CACHE, одни на все воркеры.
+
+    Состояние читается и пишется под блокировкой на cache.add, которая
+    атомарна в memcached, redis и LocMemCache. Если блокировку не
+    удалось взять за LOCK_SECONDS, запрос не блокируется.
+    """
+
+    def __init__(self):
+        self.cache = caches[settings.RATE_LIMIT_CACHE]
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        lock = f'{key}:lock'
+        deadline = time.monotonic() + LOCK_SECONDS
+        locked = self.cache.add(lock, 1, LOCK_SECONDS)
+        while not locked and time.monotonic() < deadline:
+            time.sleep(0.005)
+            locked = self.cache.add(lock, 1, LOCK_SECONDS)
+        try:
+            state, wait = spend(
+                self.cache.get(key), capacity, refill_rate, cost, time.time()
+            )
+            self.cache.set(
+                key, state, math.ceil(capacity / refill_rate) + 1
+            )
+            return wait
+        finally:
+            if locked:
+                self.cache.delete(lock)
+
+
+def get_backend():
+    path = settings.RATE_LIMIT_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Базовый throttle: корзина scope с ключом get_ident.
+
+    Скорость берется из DEFAULT_THROTTLE_RATES[scope], запрос
+    списывает get_cost токенов, при нехватке DRF отвечает 429
+    с Retry-After.
+    """
+
+    scope = None
+
+    def get_cost(self, request, view):
+        return 1
+
+    def take(self, request, scope, ident, cost):
+        rate = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope]
+        return get_backend().take(
+            f'throttle:{scope}:{ident}', *parse_rate(rate), cost
+        )
+
+    def allow_request(self, request, view):
+        cost = self.get_cost(request, view)
+        self.wait_seconds = cost and self.take(
+            request, self.scope, self.get_ident(request), cost
+        )
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ExpensiveThrottle(TokenBucketThrottle):
+    """Общая корзина дорогих запросов пользователя или IP.
+
+    Стоимость запроса - THROTTLE_COSTS[(метод, маршрут, формат)] или
+    THROTTLE_COSTS[(метод, маршрут)], остальные запросы корзину
+    не трогают.
+    """
+
+    scope = 'expensive'
+
+    def get_cost(self, request, view):
+        match = request.resolver_match
+        key = (request.method, match and match.url_name)
+        renderer = getattr(request, 'accepted_renderer', None)
+        return settings.THROTTLE_COSTS.get(
+            (*key, renderer and renderer.format),
+            settings.THROTTLE_COSTS.get(key, 0)
+        )
+
+    def get_ident(self, request):
+        if request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return super().get_ident(request)
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """Ограничивает попытки входа по IP и по email.
+
+    Каждая попытка стоит полной проверки пароля, поэтому корзины
+    ограничивают и перебор паролей, и нагрузку на CPU. Корзина email
+    списывается, только если попытку пропустила корзина IP: иначе
+    отклоненные по IP попытки опустошали бы ее и блокировали вход
+    владельцу email.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = self.take(
+            request, 'login_ip', self.get_ident(request), 1
+        )
+        email = request.data.get('email')
+        if not self.wait_seconds and isinstance(email, str) and email:
+            self.wait_seconds = self.take(
+                request, 'login_email', email.lower(), 1
+            )
+        return not self.wait_seconds
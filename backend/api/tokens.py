@@ -1,5 +1,81 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 from rest_framework_simplejwt.tokens import AccessToken, BlacklistMixin
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+class RevokedTokens:
+    """JTI отозванных токенов в памяти процесса.
+
+    Набор дополняется из BlacklistedToken не чаще раза в
+    TOKEN_BLACKLIST_SYNC_SECONDS, поэтому токен, отозванный в другом
+    процессе, здесь перестает приниматься с такой задержкой.
+    Отозванные в этом процессе токены отклоняются сразу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expires = {}
+        self._synced_at = None
+        self._next_sync = 0
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expires[jti] = expires_at
+
+    def sync(self):
+        now = timezone.now()
+        tokens = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+        if self._synced_at is not None:
+            # Запас на транзакции, закоммиченные позже blacklisted_at.
+            tokens = tokens.filter(blacklisted_at__gte=self._synced_at - (
+                timedelta(seconds=settings.TOKEN_BLACKLIST_SYNC_SECONDS)
+            ))
+        rows = list(tokens.values_list('token__jti', 'token__expires_at'))
+        with self._lock:
+            self._expires.update(rows)
+            for jti, expires_at in list(self._expires.items()):
+                if expires_at <= now:
+                    del self._expires[jti]
+            self._synced_at = now
+
+    def __contains__(self, jti):
+        with self._lock:
+            due = time.monotonic() >= self._next_sync
+            if due:
+                self._next_sync = (
+                    time.monotonic() + settings.TOKEN_BLACKLIST_SYNC_SECONDS
+                )
+        if due:
+            try:
+                self.sync()
+            except Exception:
+                self._next_sync = 0
+                raise
+        return jti in self._expires
+
+
+revoked_tokens = RevokedTokens()
 
 
 class CustomAccessToken(BlacklistMixin, AccessToken):
     """Токен авторизации."""
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in revoked_tokens:
+            raise TokenError('Токен отозван.')
+
+    def blacklist(self):
+        result = super().blacklist()
+        revoked_tokens.add(
+            self.payload[api_settings.JTI_CLAIM],
+            datetime_from_epoch(self.payload['exp'])
+        )
+        return result
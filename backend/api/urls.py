@@ -1,6 +1,8 @@
+from api.async_views import async_read_urls
 from api.views import (FavoriteViewSet, IngredientViewSet, RecipeViewSet,
-                       ShoppingCartViewSet, TagViewSet, UserViewSet, get_token)
-from django.contrib.auth import views
+                       ShoppingCartViewSet, TagViewSet, UserViewSet, get_token,
+                       logout)
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
@@ -11,9 +13,12 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', UserViewSet, basename='users')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 
+router_urls = router.urls
+if settings.ASYNC_API:
+    router_urls = async_read_urls(router_urls)
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path(
         'recipes/<int:recipe_id>/shopping_cart/',
         ShoppingCartViewSet.as_view(
@@ -39,5 +44,5 @@ urlpatterns = [
         get_token,
         name='token_obtain_pair'
     ),
-    path('auth/token/logout/', views.LogoutView.as_view(), name='logout')
+    path('auth/token/logout/', logout, name='logout')
 ]
@@ -1,33 +1,93 @@
-from io import BytesIO
-
 from api.filters import IngredientFilter, RecipeFilter
-from api.paginations import PageLimitPagination
+from api.paginations import (FeedPagination, PageLimitPagination,
+                             SyncPagination)
 from api.serializers import (FavoriteSerializer, IngredientSerializer,
                              RecipeSerializer, ShoppingCartSerializer,
-                             TagSerializer, UserSerializer, UserCreateSerializer, ChangePasswordSerializer,
-                             SubscriptionsSerializer, TokenSerializer)
-from django.db.models import Count
+                             TagSerializer, UserSerializer,
+                             UserCreateSerializer, ChangePasswordSerializer,
+                             SubscriptionsSerializer, TokenSerializer,
+                             PantrySerializer, RecipeIdsSerializer,
+                             RecipeUserSerializer)
+from django.db.models import Count, Prefetch, Q
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 
+from api import batch
+from api.fields import selection
 from api.tokens import CustomAccessToken
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
-                            Tag)
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen.canvas import Canvas
+from recipes.deletion import schedule
+from recipes.pantry import pantry_index
+from recipes.view_counts import view_counter
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListJob, SimilarRecipe, Tag)
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_200_OK, HTTP_201_CREATED,
                                    HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST,
                                    HTTP_401_UNAUTHORIZED)
-from rest_framework import mixins, viewsets
-from rest_framework.decorators import action, api_view
+from rest_framework import viewsets
+from rest_framework.decorators import action, api_view, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from api.permissions import IsAuthor, IsAdminOrReadOnly
+from api.shopping_list import (RENDERERS, STREAMS, find_or_enqueue,
+                               format_line, get_rows, job_response,
+                               pdf_response, wants_background)
+from api.throttling import LoginThrottle
 from users.models import User, Follow
 
+AUTHOR_RECIPES = Prefetch(
+    'recipes', queryset=Recipe.objects.order_by('-pub_date')
+)
+AUTHOR_RECIPE_IDS = Prefetch(
+    'recipes',
+    queryset=Recipe.objects.order_by('-pub_date').only('id', 'author_id')
+)
+# Столбцы рецепта, которые не читаются, если их нет в ответе.
+RECIPE_COLUMNS = ('name', 'image', 'text', 'cooking_time', 'views')
+
+
+def recipe_queryset(request):
+    """Рецепты только с теми связями и аннотациями, что попадут в ответ.
+
+    Аннотации is_favorited и is_in_shopping_cart нужны и одноименным
+    фильтрам RecipeFilter.
+    """
+    chosen = selection(request)
+    queryset = Recipe.objects.order_by('-pub_date').defer(
+        *(name for name in RECIPE_COLUMNS if not chosen.wants(name))
+    )
+    if chosen.expands('author'):
+        queryset = queryset.select_related('author')
+    if chosen.wants('tags'):
+        queryset = queryset.prefetch_related('tags')
+    if chosen.expands('ingredients'):
+        queryset = queryset.prefetch_related('amount_recipes__ingredient')
+    elif chosen.wants('ingredients'):
+        queryset = queryset.prefetch_related('amount_recipes')
+    for name, relation in (
+        ('is_favorited', 'favorite_recipes'),
+        ('is_in_shopping_cart', 'shopping_carts_recipes')
+    ):
+        if chosen.wants(name) or name in request.query_params:
+            queryset = queryset.annotate(**{name: Count(relation)})
+    return queryset
+
+
+def subscription_queryset(queryset, request):
+    """Авторы подписок с аннотациями и рецептами, что попадут в ответ."""
+    chosen = selection(request)
+    if chosen.wants('recipes_count'):
+        queryset = queryset.annotate(recipes_count=Count(
+            'recipes', filter=Q(recipes__deleted__isnull=True)
+        ))
+    if chosen.wants('is_subscribed'):
+        queryset = queryset.annotate(is_subscribed=Count('following'))
+    if chosen.expands('recipes'):
+        queryset = queryset.prefetch_related(AUTHOR_RECIPES)
+    elif chosen.wants('recipes'):
+        queryset = queryset.prefetch_related(AUTHOR_RECIPE_IDS)
+    return queryset
+
 
 class TagViewSet(viewsets.ModelViewSet):
     """Вьюсет для модели Tag."""
@@ -53,74 +113,204 @@ class IngredientViewSet(viewsets.ModelViewSet):
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет для модели Recipe."""
 
-    queryset = Recipe.objects.select_related(
-        'author'
-    ).prefetch_related(
-        'tags', 'ingredients'
-    ).order_by('-pub_date').annotate(
-        is_favorited=Count('favorite_recipes'),
-        is_in_shopping_cart=Count(
-            'shopping_carts_recipes'
-        )
-    )
     serializer_class = RecipeSerializer
     pagination_class = PageLimitPagination
     permission_classes = (IsAuthor,)
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        # Связи и аннотации зависят от ?fields=, ?omit= и ?expand=.
+        return recipe_queryset(self.request)
+
     def perform_create(self, serializer):
         serializer.save(
             author=self.request.user
         )
 
+    def perform_destroy(self, instance):
+        # Рецепт скрывается сразу, строки удаляет run_deletion_jobs.
+        schedule(instance)
+
+    def paginate_queryset(self, queryset):
+        # ?ids= отдает запрошенные рецепты одним списком, пустой ?ids=
+        # отклоняет RecipeFilter.
+        if self.action == 'list' and any(
+            self.request.query_params.get('ids', '').split(',')
+        ):
+            return None
+        return super().paginate_queryset(queryset)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        # Запишется в БД вместе с другими просмотрами, см. view_counts.
+        view_counter.add(instance.pk)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='pantry')
+    def get_pantry(self, request):
+        """Рецепты из имеющихся ингредиентов, сначала те, где есть все.
+
+        ?ingredients=1,2,3 (или повтором параметра) и ?max_missing=.
+        """
+        params = {
+            'ingredients': [
+                value
+                for item in request.query_params.getlist('ingredients')
+                for value in item.split(',') if value
+            ]
+        }
+        if 'max_missing' in request.query_params:
+            params['max_missing'] = request.query_params['max_missing']
+        serializer = PantrySerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        pantry_index.refresh()
+        page = self.paginate_queryset(
+            pantry_index.search(**serializer.validated_data)
+        )
+        recipes = Recipe.objects.in_bulk([pk for _, _, pk in page])
+        pantry_index.discard(
+            pk for _, _, pk in page if pk not in recipes
+        )
+        return self.get_paginated_response([
+            {
+                **RecipeUserSerializer(
+                    recipes[pk], context={'request': request}
+                ).data,
+                'missing': missing
+            }
+            for missing, _, pk in page if pk in recipes
+        ])
+
+    @action(detail=True, methods=['GET'], url_path='similar')
+    def get_similar(self, request, pk):
+        """Похожие рецепты, посчитанные build_similar_recipes."""
+        recipe = get_object_or_404(Recipe, pk=pk)
+        # select_related идет мимо RecipeManager: скрытые рецепты,
+        # ждущие удаления, отсекаются явно.
+        similar = [
+            row.similar for row in SimilarRecipe.objects.filter(
+                recipe=recipe, similar__deleted__isnull=True
+            ).select_related('similar').order_by('-score')
+        ]
+        serializer = RecipeUserSerializer(
+            similar, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='changes')
+    def get_changes(self, request):
+        """Рецепты, измененные и удаленные после ?since=.
+
+        Для фоновой синхронизации клиентов, см. recipes.sync.
+        """
+        paginator = SyncPagination()
+        recipes = paginator.paginate_changes(
+            request, recipe_queryset(request)
+        )
+        if recipes is None:
+            return paginator.get_expired_response()
+        serializer = self.get_serializer(recipes, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         methods=['GET'],
         permission_classes=(IsAuthenticated,),
+        url_path='feed'
+    )
+    def get_feed(self, request):
+        """Новые рецепты авторов из подписок, от новых к старым."""
+        paginator = FeedPagination()
+        ids = paginator.paginate_feed(request, request.user)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    def change_batch(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = batch.add if request.method == 'POST' else batch.remove
+        return Response(
+            change(model, request.user, serializer.validated_data['ids'])
+        )
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite'
+    )
+    def favorite_batch(self, request):
+        """Добавление в избранное или удаление пачки {"ids": [...]}."""
+        return self.change_batch(request, FavoriteRecipe)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart'
+    )
+    def shopping_cart_batch(self, request):
+        """Добавление в список покупок или удаление пачки рецептов."""
+        return self.change_batch(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=['DELETE'],
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart/clear'
+    )
+    def clear_shopping_cart(self, request):
+        """Очистка списка покупок."""
+        return Response(batch.clear(request.user))
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=RENDERERS,
         url_path='download_shopping_cart'
     )
     def get_shopping_cart(self, request):
-        """Загрузка списка покупок."""
-        X_OFFSET = 100
-
-        ingredients_count = {}
-        recipes = request.user.shopping_carts_recipes.all()
-
-        for recipe in recipes:
-            recipe_ingredients = recipe.ingredients.all()
-            for ingredient in recipe_ingredients:
-                key = str(
-                    ingredient.id.name + " " + "("
-                    + ingredient.id.measurement_unit + ")"
+        """Загрузка списка покупок в формате pdf, txt, csv или json."""
+        # Строки читаются сразу: под ASGI ответ отдается из event loop,
+        # где запросы к БД запрещены. Их немного - по строке
+        # на ингредиент.
+        rows = get_rows(request.user)
+        renderer = request.accepted_renderer
+        if renderer.format == 'pdf':
+            if wants_background(request, rows):
+                return job_response(
+                    request, find_or_enqueue(request.user, rows)
                 )
-                if key not in ingredients_count.keys():
-                    ingredients_count[key] = ingredient.amount
-                else:
-                    ingredients_count[key] += ingredient.amount
-
-        buffer = BytesIO()
-        p = Canvas(buffer, pagesize=A4)
-        pdfmetrics.registerFont(
-            TTFont('Aerial', 'api/Aerial.ttf')
+            from api.pdf import render_shopping_list
+
+            return pdf_response(render_shopping_list(map(format_line, rows)))
+        response = StreamingHttpResponse(
+            STREAMS[renderer.format](rows),
+            content_type=f'{renderer.media_type}; charset=utf-8'
         )
-        p.setFont('Aerial', 16)
-        y_offset = 800
-        for item in ingredients_count.items():
-            p.drawString(X_OFFSET, y_offset, item[0] + ": " + str(item[1]))
-            y_offset -= 20
-            if y_offset <= 20:
-                p.showPage()
-                p.setFont('Aerial', 16)
-                y_offset = 800
-        p.showPage()
-        p.save()
-        buffer.seek(0)
-        return FileResponse(
-            buffer,
-            as_attachment=True,
-            filename='shopping_cart.pdf'
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{renderer.format}"'
         )
+        return response
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=RENDERERS,
+        url_path=r'download_shopping_cart/(?P<job_id>[0-9a-f-]{36})'
+    )
+    def get_shopping_list_job(self, request, job_id):
+        """Статус фоновой сборки PDF или готовый файл."""
+        return job_response(request, get_object_or_404(
+            ShoppingListJob, pk=job_id, user=request.user
+        ))
 
 
 class ShoppingCartViewSet(viewsets.ModelViewSet):
@@ -128,9 +318,11 @@ class ShoppingCartViewSet(viewsets.ModelViewSet):
 
     serializer_class = ShoppingCartSerializer
     permission_classes = (IsAuthenticated,)
-    queryset = ShoppingCart.objects.all()
     lookup_field = 'recipe_id'
 
+    def get_queryset(self):
+        return ShoppingCart.objects.filter(user=self.request.user)
+
     def perform_create(self, serializer):
         recipe_id = self.kwargs.get('recipe_id')
         serializer.save(
@@ -170,8 +362,6 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         recipe_id = self.kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        recipe.favorite_count += 1
-        recipe.save()
         serializer.save(
             user=self.request.user,
             recipe=recipe
@@ -201,13 +391,15 @@ class FavoriteViewSet(viewsets.ModelViewSet):
 class UserViewSet(viewsets.ModelViewSet):
     """Вьюсет пользователей."""
 
-    queryset = User.objects.annotate(
-        recipes_count=Count('recipes'),
-        is_subscribed=Count('following')
-    )
     serializer_class = UserSerializer
     pagination_class = PageLimitPagination
 
+    def get_queryset(self):
+        queryset = User.objects.all()
+        if selection(self.request).wants('is_subscribed'):
+            queryset = queryset.annotate(is_subscribed=Count('following'))
+        return queryset
+
     def perform_create(self, serializer):
         serializer.is_valid(raise_exception=True)
         if 'password' not in self.request.data:
@@ -218,6 +410,9 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=HTTP_201_CREATED)
 
+    def perform_destroy(self, instance):
+        schedule(instance)
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return UserCreateSerializer
@@ -268,10 +463,9 @@ class UserViewSet(viewsets.ModelViewSet):
     )
     def subscribe(self, request, pk):
         if request.method == 'POST':
-            user = get_object_or_404(User.objects.annotate(
-                recipes_count=Count('recipes'),
-                is_subscribed=Count('following')
-            ), id=pk)
+            user = get_object_or_404(
+                subscription_queryset(User.objects.all(), request), id=pk
+            )
             serializer = SubscriptionsSerializer(
                 user,
                 context={'request': request}
@@ -309,11 +503,9 @@ class UserViewSet(viewsets.ModelViewSet):
         url_path='subscriptions'
     )
     def get_subscriptions(self, request):
-        queryset = User.objects.filter(
-            following__user=request.user
-        ).order_by('id').annotate(
-            recipes_count=Count('recipes'),
-            is_subscribed=Count('following')
+        queryset = subscription_queryset(
+            User.objects.filter(following__user=request.user).order_by('id'),
+            request
         )
         page = self.paginate_queryset(queryset)
         serializer = SubscriptionsSerializer(
@@ -327,12 +519,12 @@ class UserViewSet(viewsets.ModelViewSet):
 
 
 @api_view(['POST'])
+@throttle_classes([LoginThrottle])
 def get_token(request):
     """Получение токена авторизации."""
     serializer = TokenSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    email = request.data.get('email')
-    user = get_object_or_404(User, email=email)
+    user = serializer.validated_data['user']
     return Response(
         {'auth_token': str(CustomAccessToken.for_user(user))},
         status=HTTP_200_OK
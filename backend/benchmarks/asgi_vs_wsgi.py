@@ -0,0 +1,85 @@
+"""Сравнение WSGI и ASGI под нагрузкой на эндпоинты чтения.
+
+Запуск из каталога backend:
+    python -m benchmarks.asgi_vs_wsgi --concurrency 200 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.http_load import run_load, wait_for_port
+
+HOST = '127.0.0.1'
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=%D0%BA',
+)
+
+SERVERS = {
+    'wsgi': ['foodgram.wsgi', '--worker-class', 'gthread'],
+    'asgi': [
+        'foodgram.asgi', '--worker-class', 'uvicorn.workers.UvicornWorker'
+    ],
+}
+
+
+def start_server(kind, port, workers, threads):
+    command = [
+        sys.executable, '-m', 'gunicorn', *SERVERS[kind],
+        '--bind', f'{HOST}:{port}',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--log-level', 'warning',
+    ]
+    env = {**os.environ, 'DEBUG': 'False'}
+    return subprocess.Popen(command, env=env)
+
+
+def benchmark(kind, args):
+    server = start_server(kind, args.port, args.workers, args.threads)
+    try:
+        wait_for_port(HOST, args.port)
+        url = f'http://{HOST}:{args.port}'
+        asyncio.run(run_load(url, args.path, args.concurrency, args.warmup))
+        return asyncio.run(
+            run_load(url, args.path, args.concurrency, args.duration)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', action='append')
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    args = parser.parse_args()
+    args.path = args.path or list(DEFAULT_PATHS)
+
+    results = {kind: benchmark(kind, args) for kind in SERVERS}
+    print(f'{"":6}{"rps":>10}{"p50, мс":>10}{"p99, мс":>10}{"ошибки":>10}')
+    for kind, summary in results.items():
+        total = summary['*']
+        print(
+            f'{kind:6}{total["rps"]:>10}{total["p50_ms"]:>10}'
+            f'{total["p99_ms"]:>10}{total["errors"]:>10}'
+        )
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'args': vars(args), 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
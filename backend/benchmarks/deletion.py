@@ -0,0 +1,172 @@
+"""Память и длительность блокировок при удалении плодовитого автора.
+
+Запуск из каталога backend на БД, наполненной seed_benchmark:
+    python -m benchmarks.deletion --recipes 10000 --favorites 1000000
+
+Для каждого режима создается автор с --recipes рецептами, их
+ингредиентами, --favorites добавлениями в избранное и --carts в списки
+покупок от пользователей бенчмарка. Режим cascade удаляет автора
+user.delete() в одной транзакции, как раньше делала вьюха, режим
+background - через recipes.deletion: schedule() в запросе и
+порции воркера. Пиковая память - по tracemalloc, блокировка -
+длительность самой долгой транзакции.
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from benchmarks.endpoints import git_commit, setup_django
+
+BATCH_SIZE = 10000
+
+
+def create_author(name, args, rng):
+    from recipes.management.commands.seed_benchmark import PREFIX, bulk_insert
+    from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                                Recipe, ShoppingCart)
+    from users.models import User
+
+    user_ids = list(User.objects.filter(
+        username__startswith=PREFIX, is_active=True
+    ).values_list('id', flat=True))
+    ingredient_ids = list(
+        Ingredient.objects.values_list('id', flat=True)[:1000]
+    )
+    if not user_ids or not ingredient_ids:
+        raise SystemExit('Наполните БД командой seed_benchmark.')
+    author = User.objects.create_user(
+        username=f'{PREFIX}{name}', email=f'{PREFIX}{name}@example.com',
+        password=None
+    )
+    bulk_insert(
+        Recipe,
+        (
+            Recipe(
+                author=author, name=f'Рецепт {number}', text='Описание.',
+                cooking_time=10, image='recipes/images/benchmark.png'
+            )
+            for number in range(args.recipes)
+        ),
+        BATCH_SIZE
+    )
+    recipe_ids = list(author.recipes.values_list('id', flat=True))
+    bulk_insert(
+        IngredientAmount,
+        (
+            IngredientAmount(
+                recipe_id=recipe_id, ingredient_id=ingredient_id, amount=100
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(ingredient_ids, 3)
+        ),
+        BATCH_SIZE
+    )
+    for model, count in (
+        (FavoriteRecipe, args.favorites), (ShoppingCart, args.carts)
+    ):
+        bulk_insert(
+            model,
+            (
+                model(
+                    user_id=rng.choice(user_ids),
+                    recipe_id=rng.choice(recipe_ids)
+                )
+                for _ in range(count)
+            ),
+            BATCH_SIZE
+        )
+    return author
+
+
+def measure(function):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        function()
+        return (
+            round(time.perf_counter() - started, 2),
+            round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        )
+    finally:
+        tracemalloc.stop()
+
+
+def cascade(author):
+    from django.db import transaction
+
+    result = {}
+
+    def delete():
+        with transaction.atomic():
+            author.delete()
+
+    result['total_s'], result['peak_mb'] = measure(delete)
+    result['longest_transaction_s'] = result['total_s']
+    return result
+
+
+def background(author):
+    from recipes.deletion import run_job, schedule
+
+    result = {'batches': 0, 'longest_transaction_s': 0}
+    job = None
+
+    def request():
+        nonlocal job
+        job = schedule(author)
+
+    def on_batch(model, rows, seconds):
+        result['batches'] += 1
+        result['longest_transaction_s'] = max(
+            result['longest_transaction_s'], round(seconds, 3)
+        )
+
+    result['request_s'], result['request_peak_mb'] = measure(request)
+    result['total_s'], result['peak_mb'] = measure(
+        lambda: run_job(job, on_batch)
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=10_000)
+    parser.add_argument('--favorites', type=int, default=1_000_000)
+    parser.add_argument('--carts', type=int, default=1000)
+    parser.add_argument(
+        '--mode', choices=('cascade', 'background'), action='append',
+        help='По умолчанию оба режима.'
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    rng = random.Random(args.seed)
+    result = {
+        'commit': git_commit(),
+        'recipes': args.recipes,
+        'favorites': args.favorites,
+        'carts': args.carts,
+        'batch_size': settings.DELETION_BATCH_SIZE,
+    }
+    for mode in args.mode or ('cascade', 'background'):
+        started = time.perf_counter()
+        author = create_author(f'delete_{mode}_{time.time_ns()}', args, rng)
+        print(f'{mode}: данные созданы за '
+              f'{time.perf_counter() - started:.1f} с')
+        result[mode] = {'cascade': cascade, 'background': background}[mode](
+            author
+        )
+        print(f'{mode}: {result[mode]}')
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Нагрузочный прогон эндпоинтов по запросам Postman-коллекции.
+
+Запуск из каталога backend на БД, наполненной командой seed_benchmark:
+    python -m benchmarks.endpoints --client --mix read-heavy
+    python -m benchmarks.endpoints --url http://127.0.0.1:8000 --json a.json
+    python -m benchmarks.endpoints --client --compare a.json
+
+Число SQL-запросов на запрос сервер сообщает в заголовке Server-Timing,
+поэтому при --url его нужно запускать с SERVER_TIMING=True. С --client
+запросы выполняются тестовым клиентом Django в потоках этого процесса.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+
+from benchmarks.http_load import Request, run_load, summarize
+from benchmarks.postman import load_collection, render
+
+READ_FOLDERS = (
+    'users/get_user_info',
+    'tags/get_tags_info',
+    'ingredients/get_ingradients',
+    'recipes/get_recipes',
+    'subscriptions/get_subscriptions',
+    'shopping_cart/download_shopping_cart',
+    'recipe_filters_for_favorite_and_shopping_cart',
+)
+# Запросы добавления и удаления идут парами, поэтому данные
+# в ходе прогона не накапливаются.
+TOGGLE_FOLDERS = (
+    'favorite/add_to_favorite',
+    'delete_requests/favorite',
+    'shopping_cart/add_to_shopping_cart',
+    'delete_requests/shopping_cart',
+    'subscriptions/create_subscriptions',
+    'delete_requests/subscriptions',
+)
+READ_HEAVY = {
+    'recipes/get_recipes': 40,
+    'recipe_filters_for_favorite_and_shopping_cart': 10,
+    'tags/get_tags_info': 10,
+    'ingredients/get_ingradients': 10,
+    'users/get_user_info': 10,
+    'subscriptions/get_subscriptions': 8,
+    'shopping_cart/download_shopping_cart': 2,
+}
+MIXES = {
+    'collection': dict.fromkeys(READ_FOLDERS + TOGGLE_FOLDERS, 1),
+    'read-heavy': READ_HEAVY,
+    'mixed': {**READ_HEAVY, **dict.fromkeys(TOGGLE_FOLDERS, 3)},
+}
+
+USERS = ('bench_0@example.com', 'bench_1@example.com')
+PASSWORD = 'bench-password'
+
+
+def folder_weight(folder, weights):
+    if 'bad_requests' in folder:
+        return 0
+    return max(
+        (
+            weight for prefix, weight in weights.items()
+            if folder == prefix or folder.startswith(prefix + '/')
+        ),
+        default=0
+    )
+
+
+def build_requests(collection, variables, weights):
+    """Запросы смеси, каждый повторен по весу своей папки."""
+    requests = []
+    for item in collection:
+        weight = folder_weight(item.folder, weights)
+        if not weight:
+            continue
+        path = item.url.replace('{{baseUrl}}', '')
+        name = f'{item.method} {path}'
+        if 'Authorization' not in item.headers:
+            name += ' (anon)'
+        request = Request(
+            name,
+            item.method,
+            quote(render(path, variables), safe='/?=&%'),
+            render(item.body, variables) if item.body else None,
+            {
+                header: render(value, variables)
+                for header, value in item.headers.items()
+            }
+        )
+        requests.extend([request] * weight)
+    return requests
+
+
+def results_list(data):
+    return data['results'] if isinstance(data, dict) else data
+
+
+def prepare_variables(fetch, variables, users, password):
+    """Значения переменных коллекции из данных в БД.
+
+    В Postman их выставляют тестовые скрипты коллекции, здесь их берут
+    у существующих пользователей, тегов, ингредиентов и рецептов.
+    """
+    variables = {**variables, 'baseUrl': ''}
+    tokens, user_ids = [], []
+    for email in users:
+        status, data = fetch(
+            'POST', '/api/auth/token/login/',
+            {'email': email, 'password': password}
+        )
+        if status != 200:
+            raise SystemExit(
+                f'Не удалось войти как {email} ({status}), наполните БД '
+                'командой seed_benchmark.'
+            )
+        tokens.append(data['auth_token'])
+        _, me = fetch('GET', '/api/users/me/', token=tokens[-1])
+        user_ids.append(me['id'])
+    variables['userToken'], variables['secondUserToken'] = tokens
+    variables['userId'], variables['secondUserId'] = user_ids
+    variables['thirdUserId'] = next(
+        user['id']
+        for user in results_list(fetch('GET', '/api/users/?limit=10')[1])
+        if user['id'] not in user_ids
+    )
+    tags = results_list(fetch('GET', '/api/tags/')[1])
+    for number, tag in zip(('first', 'second', 'third'), tags):
+        variables[f'{number}TagId'] = tag['id']
+        variables[f'{number}TagSlug'] = tag['slug']
+    ingredients = results_list(fetch('GET', '/api/ingredients/')[1])
+    for number, ingredient in zip(('first', 'second'), ingredients):
+        variables[f'{number}IndredientId'] = ingredient['id']
+    variables['ingredientNameFirstLatter'] = ingredients[0]['name'][0]
+    recipes = results_list(fetch('GET', '/api/recipes/?limit=5')[1])
+    for number, recipe in zip(
+        ('first', 'second', 'third', 'fourth', 'fifth'), recipes
+    ):
+        variables[f'{number}RecipeId'] = recipe['id']
+    variables['recipeId'] = recipes[0]['id']
+    return variables
+
+
+def server_fetch(url):
+    def fetch(method, path, data=None, token=None):
+        request = urllib.request.Request(
+            url + path, method=method,
+            data=json.dumps(data).encode() if data else None,
+            headers={'Content-Type': 'application/json'}
+        )
+        if token:
+            request.add_header('Authorization', f'Token {token}')
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+    return fetch
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+
+def client_fetch(method, path, data=None, token=None):
+    from django.test import Client
+
+    extra = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+    response = Client().generic(
+        method, path, json.dumps(data) if data else '',
+        content_type='application/json', **extra
+    )
+    if response.status_code >= 400:
+        return response.status_code, None
+    return response.status_code, response.json()
+
+
+def client_worker(requests, deadline, samples, rng):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client(raise_request_exception=False)
+    try:
+        while time.perf_counter() < deadline:
+            request = rng.choice(requests)
+            extra = {
+                'HTTP_' + header.upper().replace('-', '_'): value
+                for header, value in request.headers.items()
+            }
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                status = client.generic(
+                    request.method, request.path, request.body or '',
+                    content_type='application/json', **extra
+                ).status_code
+            samples.append((
+                request.name, status, time.perf_counter() - started,
+                len(queries)
+            ))
+    finally:
+        connection.close()
+
+
+def run_client(requests, concurrency, duration, seed=0):
+    """Аналог run_load для тестового клиента Django."""
+    samples = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(
+            target=client_worker,
+            args=(requests, deadline, samples, random.Random(seed + number))
+        )
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, duration)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, previous=None):
+    print(
+        f'{"":64}{"запросов":>9}{"rps":>8}{"p50":>8}{"p95":>8}'
+        f'{"p99":>8}{"SQL":>6}{"ошибки":>7}'
+    )
+    for name, row in sorted(results.items()):
+        print(
+            f'{name[:63]:64}{row["requests"]:>9}{row["rps"]:>8}'
+            f'{row["p50_ms"]:>8}{row["p95_ms"]:>8}{row["p99_ms"]:>8}'
+            f'{row.get("avg_queries", "-"):>6}{row["errors"]:>7}'
+        )
+        old = (previous or {}).get(name)
+        if old:
+            print(
+                f'{"  было":64}{old["requests"]:>9}{old["rps"]:>8}'
+                f'{old["p50_ms"]:>8}{old["p95_ms"]:>8}{old["p99_ms"]:>8}'
+                f'{old.get("avg_queries", "-"):>6}{old["errors"]:>7}'
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='Адрес запущенного сервера.')
+    target.add_argument(
+        '--client', action='store_true',
+        help='Тестовый клиент Django в этом процессе.'
+    )
+    parser.add_argument('--mix', choices=MIXES, default='read-heavy')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--user', action='append', help='Email; дважды.')
+    parser.add_argument('--password', default=PASSWORD)
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    parser.add_argument('--compare', help='JSON прошлого прогона.')
+    args = parser.parse_args()
+
+    if args.client:
+        setup_django()
+        fetch = client_fetch
+    else:
+        args.url = args.url.rstrip('/')
+        fetch = server_fetch(args.url)
+    collection, variables = load_collection()
+    variables = prepare_variables(
+        fetch, variables, args.user or USERS, args.password
+    )
+    requests = build_requests(collection, variables, MIXES[args.mix])
+
+    def run(duration):
+        if args.client:
+            return run_client(requests, args.concurrency, duration, args.seed)
+        return asyncio.run(run_load(
+            args.url, requests, args.concurrency, duration,
+            {'X-Server-Timing': '1'}, args.seed
+        ))
+
+    if args.warmup:
+        run(args.warmup)
+    results = run(args.duration)
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)['results']
+    print_results(results, previous)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(
+                {'commit': git_commit(), 'args': vars(args),
+                 'results': results},
+                file, indent=2, ensure_ascii=False
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Размер ответа и время страниц списков с ?fields=, ?omit= и ?expand=.
+
+Запуск из каталога backend на БД, наполненной seed_benchmark:
+    python -m benchmarks.fields --limit 50 --repeat 200
+
+Каждый вариант запрашивается --repeat раз тестовым клиентом Django от
+имени пользователя бенчмарка; выводятся байты ответа, число
+SQL-запросов и p50/p99 времени.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.endpoints import git_commit, setup_django
+from foodgram.timing import percentile
+
+VARIANTS = (
+    ('recipes full', '/api/recipes/', {}),
+    ('recipes grid', '/api/recipes/', {
+        'fields': 'id,name,image,cooking_time'
+    }),
+    ('recipes omit', '/api/recipes/', {'omit': 'text,ingredients'}),
+    ('recipes collapsed', '/api/recipes/', {'expand': ''}),
+    ('users full', '/api/users/', {}),
+    ('users names', '/api/users/', {'fields': 'id,username'}),
+    ('subscriptions full', '/api/users/subscriptions/', {}),
+    ('subscriptions collapsed', '/api/users/subscriptions/', {
+        'expand': ''
+    }),
+)
+
+
+def run(client, url, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    if response.status_code != 200:
+        raise SystemExit(f'{url}: {response.status_code}')
+    timings.sort()
+    return {
+        'bytes': len(response.content),
+        'queries': len(queries),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    args = parser.parse_args()
+
+    setup_django()
+    from urllib.parse import urlencode
+
+    from django.test import Client
+
+    from api.tokens import CustomAccessToken
+    from recipes.management.commands.seed_benchmark import PREFIX
+    from users.models import User
+
+    user = User.objects.filter(
+        username__startswith=PREFIX, is_active=True, follower__isnull=False
+    ).first()
+    if user is None:
+        raise SystemExit('Наполните БД командой seed_benchmark.')
+    client = Client(
+        HTTP_AUTHORIZATION=f'Token {CustomAccessToken.for_user(user)}'
+    )
+    result = {'commit': git_commit(), 'limit': args.limit}
+    for name, path, params in VARIANTS:
+        url = f'{path}?{urlencode({**params, "limit": args.limit})}'
+        result[name] = run(client, url, args.repeat)
+        print(f'{name:25}{url:60}', result[name])
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
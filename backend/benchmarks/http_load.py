@@ -0,0 +1,161 @@
+"""Генератор HTTP-нагрузки на asyncio без внешних зависимостей."""
+import asyncio
+import random
+import re
+import socket
+import time
+from collections import defaultdict, namedtuple
+from urllib.parse import urlsplit
+
+from foodgram.timing import percentile
+
+SERVER_TIMING_QUERIES = re.compile(r'\bdb;[^,]*desc="(\d+) queries"')
+
+Request = namedtuple(
+    'Request', 'name method path body headers', defaults=(None, None)
+)
+
+
+def as_request(item):
+    """Путь строкой превращается в GET-запрос."""
+    if isinstance(item, Request):
+        return item
+    return Request(item, 'GET', item)
+
+
+def summarize(samples, duration):
+    """Сводка: пропускная способность и задержки в мс, по каждому запросу.
+
+    samples - кортежи (имя, статус, время в секундах, число SQL-запросов
+    или None, если сервер его не сообщил).
+    """
+    grouped = defaultdict(list)
+    for name, *sample in samples:
+        grouped[name].append(sample)
+    grouped['*'] = [sample for _, *sample in samples]
+    result = {}
+    for name, items in grouped.items():
+        latencies = sorted(elapsed * 1000 for _, elapsed, _ in items)
+        queries = [count for _, _, count in items if count is not None]
+        result[name] = {
+            'requests': len(items),
+            'errors': sum(
+                1 for status, _, _ in items
+                if status is None or status >= 500
+            ),
+            'rps': round(len(items) / duration, 1),
+            'p50_ms': round(percentile(latencies, 50) or 0, 2),
+            'p95_ms': round(percentile(latencies, 95) or 0, 2),
+            'p99_ms': round(percentile(latencies, 99) or 0, 2),
+        }
+        if queries:
+            result[name]['avg_queries'] = round(
+                sum(queries) / len(queries), 1
+            )
+    return result
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Соединение закрыто сервером.')
+    status = int(status_line.split()[1])
+    length, chunked, close, queries = None, False, False, None
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            close = value == 'close'
+        elif name == 'server-timing':
+            match = SERVER_TIMING_QUERIES.search(value)
+            if match:
+                queries = int(match.group(1))
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        close = True
+    return status, close, queries
+
+
+def encode_request(request, host, headers):
+    body = request.body.encode() if request.body else b''
+    headers = {**headers, **(request.headers or {})}
+    if body:
+        headers.setdefault('Content-Type', 'application/json')
+        headers['Content-Length'] = len(body)
+    elif request.method not in ('GET', 'HEAD'):
+        headers['Content-Length'] = 0
+    head = ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+    return (
+        f'{request.method} {request.path} HTTP/1.1\r\n'
+        f'Host: {host}\r\n{head}\r\n'
+    ).encode() + body
+
+
+async def worker(url, requests, headers, deadline, samples, rng):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    writer = None
+    while time.perf_counter() < deadline:
+        request = rng.choice(requests)
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(encode_request(request, host, headers))
+            await writer.drain()
+            status, close, queries = await read_response(reader)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            status, close, queries = None, True, None
+        samples.append(
+            (request.name, status, time.perf_counter() - started, queries)
+        )
+        if close and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, paths, concurrency, duration, headers=None, seed=0):
+    """Нагружает сервер запросами paths (с весами через повторы).
+
+    Элементы paths - пути для GET или объекты Request.
+    """
+    requests = [as_request(item) for item in paths]
+    samples = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        worker(
+            url, requests, headers or {}, deadline, samples,
+            random.Random(seed + number)
+        )
+        for number in range(concurrency)
+    ))
+    return summarize(samples, duration)
+
+
+def wait_for_port(host, port, timeout=30):
+    """Ждет, пока сервер начнет принимать соединения."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f'Сервер {host}:{port} не запустился.')
@@ -0,0 +1,76 @@
+"""Время поиска по ингредиентам на синтетическом индексе.
+
+Запуск из каталога backend, БД не нужна:
+    python -m benchmarks.pantry --recipes 100000 --ingredients 2200
+
+Рецепты получают 3-12 ингредиентов с популярностью по Ципфу, запросы
+- наборы из --pantry ингредиентов с той же популярностью.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.endpoints import setup_django
+from foodgram.timing import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=100_000)
+    parser.add_argument('--ingredients', type=int, default=2200)
+    parser.add_argument('--pantry', type=int, default=20)
+    parser.add_argument('--max-missing', type=int, default=2)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    args = parser.parse_args()
+
+    setup_django()
+    from recipes.management.commands.seed_benchmark import (
+        sample_distinct, zipf_cum_weights)
+    from recipes.pantry import PantryIndex
+
+    rng = random.Random(args.seed)
+    ingredients = list(range(1, args.ingredients + 1))
+    weights = zipf_cum_weights(len(ingredients), exponent=0.9)
+    pairs = [
+        (recipe_id, ingredient_id)
+        for recipe_id in range(1, args.recipes + 1)
+        for ingredient_id in sample_distinct(
+            rng, ingredients, weights, rng.randint(3, 12)
+        )
+    ]
+    index = PantryIndex()
+    started = time.perf_counter()
+    index.build(pairs)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    timings, found = [], 0
+    for _ in range(args.queries):
+        pantry = sample_distinct(rng, ingredients, weights, args.pantry)
+        started = time.perf_counter()
+        found += len(index.search(pantry, args.max_missing))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    started = time.perf_counter()
+    index.replace(args.recipes // 2, set(rng.sample(ingredients, 8)))
+    replace_ms = (time.perf_counter() - started) * 1000
+
+    result = {
+        'pairs': len(pairs),
+        'build_ms': round(build_ms, 1),
+        'replace_ms': round(replace_ms, 2),
+        'search_p50_ms': round(percentile(timings, 50), 2),
+        'search_p99_ms': round(percentile(timings, 99), 2),
+        'avg_results': round(found / args.queries, 1),
+    }
+    for key, value in result.items():
+        print(f'{key}: {value}')
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Чтение запросов из Postman-коллекции проекта."""
+import json
+import re
+from collections import namedtuple
+from pathlib import Path
+
+COLLECTION = (
+    Path(__file__).resolve().parents[2]
+    / 'postman-collection' / 'diploma.postman_collection.json'
+)
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+PostmanRequest = namedtuple(
+    'PostmanRequest', 'folder name method url headers body'
+)
+
+
+def clean_name(name):
+    """Имя без пояснений вида ' // User'."""
+    return name.split(' // ')[0].strip()
+
+
+def auth_headers(auth):
+    if not auth or auth['type'] != 'apikey':
+        return {}
+    values = {item['key']: item['value'] for item in auth['apikey']}
+    return {values['key']: values['value']}
+
+
+def walk(items, folder=(), auth=None):
+    """Запросы коллекции с учетом авторизации, унаследованной от папок."""
+    for item in items:
+        if 'item' in item:
+            yield from walk(
+                item['item'],
+                folder + (clean_name(item['name']),),
+                item.get('auth') or auth
+            )
+            continue
+        request = item['request']
+        headers = auth_headers(request.get('auth') or auth)
+        headers.update(
+            (header['key'], header['value'])
+            for header in request.get('header', ())
+            if not header.get('disabled')
+        )
+        url = request['url']
+        yield PostmanRequest(
+            '/'.join(folder),
+            clean_name(item['name']),
+            request['method'],
+            url['raw'] if isinstance(url, dict) else url,
+            headers,
+            request.get('body', {}).get('raw') or None
+        )
+
+
+def load_collection(path=COLLECTION):
+    """Запросы и переменные коллекции."""
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', ())
+    }
+    return list(walk(collection['item'])), variables
+
+
+def render(text, variables):
+    """Подставляет {{переменные}}, KeyError для неизвестных."""
+    return VARIABLE.sub(
+        lambda match: str(variables[match.group(1)]), text
+    )
@@ -0,0 +1,110 @@
+"""Время пересчета рейтингов рецептов на большой таблице избранного.
+
+Запуск из каталога backend на БД, наполненной seed_benchmark:
+    python -m benchmarks.rankings --favorites 10000000 --json rankings.json
+
+Недостающие до --favorites строки избранного добавляются между
+пользователями и рецептами бенчмарка (удаляются seed_benchmark
+--clear). Замеряются полный пересчет и инкрементальный после
+добавления --recent свежих строк.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.endpoints import git_commit, setup_django
+
+BATCH_SIZE = 10000
+
+
+def add_favorites(count, rng, recent=False):
+    from django.utils import timezone
+
+    from recipes.management.commands.seed_benchmark import (HISTORY_DAYS,
+                                                            PREFIX,
+                                                            bulk_insert,
+                                                            zipf_cum_weights)
+    from recipes.models import FavoriteRecipe, Recipe
+    from users.models import User
+
+    user_ids = list(User.objects.filter(
+        username__startswith=PREFIX
+    ).values_list('id', flat=True))
+    recipe_ids = list(Recipe.objects.filter(
+        author__username__startswith=PREFIX
+    ).order_by('id').values_list('id', flat=True))
+    if not user_ids or not recipe_ids:
+        raise SystemExit('Наполните БД командой seed_benchmark.')
+    rng.shuffle(recipe_ids)
+    weights = zipf_cum_weights(len(recipe_ids))
+    now = timezone.now()
+    days = 0 if recent else HISTORY_DAYS
+    return bulk_insert(
+        FavoriteRecipe,
+        (
+            FavoriteRecipe(
+                user_id=rng.choice(user_ids),
+                recipe_id=rng.choices(recipe_ids, cum_weights=weights)[0],
+                created=now - timedelta(days=rng.random() * days)
+            )
+            for _ in range(count)
+        ),
+        BATCH_SIZE
+    )
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, round(time.perf_counter() - started, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--favorites', type=int, default=10_000_000)
+    parser.add_argument('--recent', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+
+    from recipes.models import FavoriteRecipe
+    from recipes.rankings import refresh
+
+    rng = random.Random(args.seed)
+    existing = FavoriteRecipe.objects.count()
+    if existing < args.favorites:
+        _, elapsed = timed(add_favorites, args.favorites - existing, rng)
+        print(f'добавлено избранного: {args.favorites - existing} '
+              f'за {elapsed} с')
+    result = {
+        'commit': git_commit(),
+        'favorites': FavoriteRecipe.objects.count(),
+        'full_s': [],
+        'incremental_s': [],
+    }
+    for _ in range(args.repeat):
+        rankings, elapsed = timed(refresh)
+        result['full_s'].append(elapsed)
+        result['rankings'] = rankings
+        since = timezone.now()
+        add_favorites(args.recent, rng, recent=True)
+        result['changed'], elapsed = timed(refresh, since)
+        result['incremental_s'].append(elapsed)
+    print(f'строк избранного: {result["favorites"]}, '
+          f'рейтингов: {result["rankings"]}')
+    print(f'полный пересчет, с: {result["full_s"]}')
+    print(f'инкрементальный ({result["changed"]} рецептов), с: '
+          f'{result["incremental_s"]}')
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
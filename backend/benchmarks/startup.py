@@ -0,0 +1,138 @@
+"""Время старта воркера: импорты, первый запрос и RSS.
+
+Запуск из каталога backend:
+    python -m benchmarks.startup --imports-only
+    python -m benchmarks.startup --json startup.json
+
+Завершается с ошибкой, если при старте импортируются модули из
+LAZY_MODULES или превышены заданные бюджеты.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.http_load import wait_for_port
+
+HOST = '127.0.0.1'
+
+# Тяжелые библиотеки, которые должны грузиться только при первом
+# обращении к использующему их эндпоинту.
+LAZY_MODULES = ('reportlab',)
+
+STARTUP_CODE = (
+    'import django; django.setup(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+def import_times():
+    """Суммарное время импорта по пакетам верхнего уровня, в мс."""
+    env = {**os.environ}
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        env=env, capture_output=True, text=True, check=True
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, self_time, name = line.split('|')
+        if not self_time.strip().isdigit():
+            continue
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_time)
+    return {
+        package: round(microseconds / 1000, 1)
+        for package, microseconds in sorted(
+            packages.items(), key=lambda item: item[1], reverse=True
+        )
+    }
+
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as children:
+        return [int(pid) for pid in children.read().split()]
+
+
+def first_request(port, workers, path):
+    """Время до первого успешного ответа и RSS каждого воркера."""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', 'foodgram.wsgi',
+            '--bind', f'{HOST}:{port}', '--workers', str(workers),
+            '--log-level', 'warning',
+        ],
+        env={**os.environ, 'DEBUG': 'False'}
+    )
+    try:
+        wait_for_port(HOST, port)
+        with urllib.request.urlopen(f'http://{HOST}:{port}{path}') as answer:
+            answer.read()
+        elapsed = time.perf_counter() - started
+        return {
+            'time_to_first_request_ms': round(elapsed * 1000, 1),
+            'worker_rss_mb': [rss_mb(pid) for pid in worker_pids(server.pid)],
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--imports-only', action='store_true')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--path', default='/api/tags/')
+    parser.add_argument('--max-import-ms', type=float)
+    parser.add_argument('--max-rss-mb', type=float)
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    args = parser.parse_args()
+
+    packages = import_times()
+    result = {
+        'import_total_ms': round(sum(packages.values()), 1),
+        'imports_ms': packages,
+    }
+    print(f'Импорт при старте: {result["import_total_ms"]} мс')
+    for package, elapsed in list(packages.items())[:args.top]:
+        print(f'  {package:30}{elapsed:>10}')
+    if not args.imports_only:
+        result.update(first_request(args.port, args.workers, args.path))
+        print(f'Первый запрос: {result["time_to_first_request_ms"]} мс')
+        print(f'RSS воркеров, МБ: {result["worker_rss_mb"]}')
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2, ensure_ascii=False)
+
+    errors = [
+        f'{module} импортируется при старте'
+        for module in LAZY_MODULES if module in packages
+    ]
+    if args.max_import_ms and result['import_total_ms'] > args.max_import_ms:
+        errors.append(f'импорт дольше {args.max_import_ms} мс')
+    if args.max_rss_mb and max(result.get('worker_rss_mb') or [0]) > (
+        args.max_rss_mb
+    ):
+        errors.append(f'RSS воркера больше {args.max_rss_mb} МБ')
+    if errors:
+        sys.exit('Регрессия старта: ' + '; '.join(errors))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Объем и время синхронизации рецептов: полная выгрузка против изменений.
+
+Запуск из каталога backend на БД, наполненной seed_benchmark:
+    python -m benchmarks.sync --changes 50 --deletes 10
+
+Полная выгрузка проходит все страницы /api/recipes/, как делали
+клиенты, затем после --changes измененных рецептов и --deletes
+надгробий клиент догоняет изменения через /api/recipes/changes/.
+Надгробия пишутся для несуществующих id и удаляются в конце, рецепты
+только отмечаются измененными.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.endpoints import git_commit, setup_django
+
+
+def crawl(client, url):
+    """Проходит страницы по next: (байт, страниц, секунд, последний ответ)."""
+    size = pages = 0
+    started = time.perf_counter()
+    while url:
+        response = client.get(url)
+        if response.status_code != 200:
+            raise SystemExit(f'{url}: {response.status_code}')
+        data = response.json()
+        size += len(response.content)
+        pages += 1
+        url = data['next']
+    return size, pages, time.perf_counter() - started, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--changes', type=int, default=50)
+    parser.add_argument('--deletes', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import Max
+    from django.test import Client, override_settings
+    from django.utils import timezone
+
+    from recipes.models import Recipe, RecipeTombstone
+    from recipes.sync import bury, touch
+
+    rng = random.Random(args.seed)
+    client = Client()
+    result = {'commit': git_commit(), 'limit': args.limit}
+    with override_settings(SYNC_LAG_SECONDS=0):
+        size, pages, seconds, _ = crawl(
+            client, f'/api/recipes/?limit={args.limit}'
+        )
+        result['full'] = {
+            'bytes': size, 'pages': pages, 'seconds': round(seconds, 2)
+        }
+        size, pages, seconds, data = crawl(
+            client, f'/api/recipes/changes/?limit={args.limit}'
+        )
+        result['initial_sync'] = {
+            'bytes': size, 'pages': pages, 'seconds': round(seconds, 2)
+        }
+        ids = list(Recipe.objects.values_list('id', flat=True))
+        touch(rng.sample(ids, min(args.changes, len(ids))))
+        top = Recipe._base_manager.aggregate(top=Max('id'))['top'] or 0
+        fake_ids = range(top + 1_000_000, top + 1_000_000 + args.deletes)
+        bury(fake_ids, timezone.now())
+        try:
+            size, pages, seconds, data = crawl(
+                client,
+                f'/api/recipes/changes/?limit={args.limit}'
+                f'&since={data["since"]}'
+            )
+        finally:
+            RecipeTombstone.objects.filter(recipe_id__in=fake_ids).delete()
+        result['delta_sync'] = {
+            'bytes': size, 'pages': pages, 'seconds': round(seconds, 3)
+        }
+    for key, value in result.items():
+        print(f'{key}: {value}')
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Админка для больших таблиц.
+
+Число строк без фильтров берется из статистики PostgreSQL вместо
+COUNT(*), варианты фильтров по столбцам кешируются, а внешние ключи
+выбираются автодополнением вместо выпадающих списков на всю таблицу.
+Пользователи и рецепты удаляются в фоне, см. recipes.deletion.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from recipes.deletion import schedule
+
+FILTER_CHOICES_LIMIT = 200
+
+
+def estimated_count(queryset):
+    """Оценка числа строк таблицы queryset или None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)]
+        )
+        row = cursor.fetchone()
+    # -1 у таблиц, для которых еще не собиралась статистика.
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Без фильтров и поиска считает строки по оценке PostgreSQL.
+
+    На таблицах меньше ADMIN_ESTIMATED_COUNT_MIN строк и с фильтрами
+    выполняется обычный COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if (
+                estimate is not None
+                and estimate >= settings.ADMIN_ESTIMATED_COUNT_MIN
+            ):
+                return estimate
+        return super().count
+
+
+def cached_choices_filter(field, title):
+    """Фильтр по значениям field, кешируемым на ADMIN_FILTER_CACHE_SECONDS.
+
+    Выводится не больше FILTER_CHOICES_LIMIT значений.
+    """
+
+    class CachedChoicesFilter(admin.SimpleListFilter):
+        parameter_name = field
+
+        def lookups(self, request, model_admin):
+            model = model_admin.model
+            return cache.get_or_set(
+                f'admin-filter:{model._meta.label_lower}:{field}',
+                lambda: [
+                    (value, value) for value in model.objects.order_by(
+                        field
+                    ).values_list(field, flat=True).distinct()[
+                        :FILTER_CHOICES_LIMIT
+                    ]
+                ],
+                settings.ADMIN_FILTER_CACHE_SECONDS
+            )
+
+        def queryset(self, request, queryset):
+            if self.value() is None:
+                return queryset
+            return queryset.filter(**{field: self.value()})
+
+    CachedChoicesFilter.title = title
+    return CachedChoicesFilter
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Основа админок больших таблиц."""
+
+    paginator = EstimatedCountPaginator
+    # Иначе на каждой странице с фильтром - COUNT(*) по всей таблице.
+    show_full_result_count = False
+
+
+class BackgroundDeleteAdmin(LargeTableAdmin):
+    """Удаление через очередь recipes.deletion, без каскада в запросе."""
+
+    def get_deleted_objects(self, objs, request):
+        # Страница подтверждения обходит весь каскад, а зависимых строк
+        # могут быть миллионы; суперпользователю права на них не нужны.
+        if not request.user.is_superuser:
+            return super().get_deleted_objects(objs, request)
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        schedule(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset.iterator():
+            schedule(obj)
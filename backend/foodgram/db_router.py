@@ -0,0 +1,114 @@
+import itertools
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_routing = ContextVar('replica_routing', default=None)
+_pool = None
+
+
+class Routing:
+    """Состояние маршрутизации чтения для текущего запроса."""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.alias = None
+
+
+def start_routing(use_replica):
+    """Включает маршрутизацию для запроса, возвращает токен для сброса."""
+    return _routing.set(Routing(use_replica))
+
+
+def stop_routing(token):
+    """Сбрасывает маршрутизацию после завершения запроса."""
+    _routing.reset(token)
+
+
+def current_replica():
+    """Реплика, выбранная для текущего запроса, или None."""
+    routing = _routing.get()
+    if routing is None or routing.alias in (None, DEFAULT_DB_ALIAS):
+        return None
+    return routing.alias
+
+
+class ReplicaPool:
+    """Реплики с выбором по кругу и временным исключением недоступных."""
+
+    def __init__(self, aliases, eject_seconds):
+        self.aliases = tuple(aliases)
+        self.eject_seconds = eject_seconds
+        self._counter = itertools.count()
+        self._ejected = {}
+
+    def eject(self, alias):
+        self._ejected[alias] = time.monotonic() + self.eject_seconds
+
+    def is_healthy(self, alias):
+        if self._ejected.get(alias, 0) > time.monotonic():
+            return False
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            self.eject(alias)
+            return False
+        self._ejected.pop(alias, None)
+        return True
+
+    def check_failed(self, alias):
+        """Исключает реплику, если после ошибки ее соединение не живо.
+
+        ensure_connection в is_healthy ловит только ошибки открытия
+        соединения, а уже открытое может оборваться посреди запроса.
+        """
+        connection = connections[alias]
+        if connection.connection is not None and connection.is_usable():
+            return False
+        self.eject(alias)
+        return True
+
+    def choose(self):
+        """Следующая доступная реплика или None, если живых реплик нет."""
+        if not self.aliases:
+            return None
+        start = next(self._counter)
+        for offset in range(len(self.aliases)):
+            alias = self.aliases[(start + offset) % len(self.aliases)]
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ReplicaPool(
+            settings.DATABASE_REPLICAS,
+            settings.REPLICA_EJECT_SECONDS
+        )
+    return _pool
+
+
+class ReplicaRouter:
+    """Чтение с реплик в безопасных запросах, запись в основную БД.
+
+    Реплика выбирается один раз на запрос, чтобы все чтения внутри
+    запроса видели одно и то же состояние данных.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or not routing.use_replica:
+            return DEFAULT_DB_ALIAS
+        if routing.alias is None:
+            routing.alias = get_pool().choose() or DEFAULT_DB_ALIAS
+        return routing.alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,214 @@
+import hashlib
+import logging
+from time import perf_counter
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.db_router import (current_replica, get_pool, start_routing,
+                                stop_routing)
+from foodgram.queries import QueryPatternError, find_problems
+from foodgram.timing import (get_timings, install_execute_wrapper,
+                             start_timing, stop_timing, view_stats)
+
+logger = logging.getLogger('foodgram.performance')
+
+
+def get_client_key(request):
+    """Ключ клиента по токену или сессии, None для анонимных."""
+    credentials = request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return hashlib.sha1(credentials.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """Отправляет чтение на реплики.
+
+    После успешной записи клиент на REPLICA_PIN_SECONDS закрепляется
+    за основной БД, чтобы сразу видеть свои изменения
+    (избранное, список покупок, подписки).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def get_pin_key(self, request):
+        client_key = get_client_key(request)
+        return client_key and f'replica-pin:{client_key}'
+
+    def use_replica(self, request, pin_key):
+        return (
+            request.method in SAFE_METHODS
+            and not (pin_key and cache.get(pin_key))
+        )
+
+    def pin(self, request, response, pin_key):
+        if (
+            pin_key
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            cache.set(pin_key, True, settings.REPLICA_PIN_SECONDS)
+
+    def process_exception(self, request, exception):
+        # Ошибки вьюхи Django превращает в ответ 500 раньше, чем они
+        # дойдут до __call__: оборванная реплика исключается здесь.
+        if isinstance(exception, DatabaseError):
+            alias = current_replica()
+            if alias is not None and get_pool().check_failed(alias):
+                logger.warning('Реплика %s исключена после ошибки', alias)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pin_key = self.get_pin_key(request)
+        token = start_routing(self.use_replica(request, pin_key))
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_routing(token)
+        self.pin(request, response, pin_key)
+        return response
+
+    async def __acall__(self, request):
+        pin_key = self.get_pin_key(request)
+        token = start_routing(await sync_to_async(
+            self.use_replica, thread_sensitive=False
+        )(request, pin_key))
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_routing(token)
+        await sync_to_async(self.pin, thread_sensitive=False)(
+            request, response, pin_key
+        )
+        return response
+
+
+class ServerTimingMiddleware:
+    """Замеры запроса: заголовок Server-Timing, лог медленных запросов,
+    статистика по вьюхам и проверка N+1 и бюджетов запросов.
+
+    Заголовок добавляется ко всем ответам при SERVER_TIMING = True,
+    иначе по заголовку запроса X-Server-Timing для staff или в DEBUG.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(install_execute_wrapper)
+        for connection in connections.all():
+            install_execute_wrapper(connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_template_response = (
+                self.aprocess_template_response
+            )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = start_timing()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = stop_timing(token)
+        self.finish(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        token = start_timing()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = stop_timing(token)
+        await sync_to_async(self.finish, thread_sensitive=False)(
+            request, response, timings
+        )
+        return response
+
+    def mark_render_start(self, response):
+        timings = get_timings()
+        if timings is not None and not response.is_rendered:
+            timings.render_started = perf_counter()
+
+    def process_template_response(self, request, response):
+        self.mark_render_start(response)
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        self.mark_render_start(response)
+        return response
+
+    def finish(self, request, response, timings):
+        finished = perf_counter()
+        if timings.render_started and 'render' not in timings.metrics:
+            timings.metrics['render'] = finished - timings.render_started
+        total_ms = (finished - timings.started) * 1000
+        view_name = (
+            request.resolver_match.view_name
+            if request.resolver_match else 'unresolved'
+        )
+        view_stats.record(
+            f'{request.method} {view_name}', total_ms, len(timings.queries)
+        )
+        if total_ms > settings.SLOW_REQUEST_MS:
+            logger.warning(
+                'Медленный запрос %s %s: %.1f мс, запросов к БД: %d, '
+                'SQL: %.1f мс. Самые медленные запросы:\n%s',
+                request.method, request.path, total_ms,
+                len(timings.queries), timings.sql_time * 1000,
+                '\n'.join(
+                    f'{duration * 1000:.1f} мс: {sql}'
+                    for duration, sql in timings.slowest_queries(
+                        settings.SLOW_REQUEST_QUERIES
+                    )
+                )
+            )
+        if self.wants_header(request):
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={timings.sql_time * 1000:.1f};'
+                f'desc="{len(timings.queries)} queries"',
+                *(
+                    f'{name};dur={duration * 1000:.1f}'
+                    for name, duration in timings.metrics.items()
+                ),
+                f'total;dur={total_ms:.1f}',
+            ))
+        if settings.QUERY_CHECKS != 'off':
+            self.check_queries(request, view_name, timings)
+
+    def check_queries(self, request, view_name, timings):
+        problems = find_problems(request.method, view_name, timings.queries)
+        if not problems:
+            return
+        message = f'{request.method} {request.path}: ' + '; '.join(problems)
+        if settings.QUERY_CHECKS == 'raise':
+            raise QueryPatternError(message)
+        logger.warning(message)
+
+    def wants_header(self, request):
+        if settings.SERVER_TIMING:
+            return True
+        if 'HTTP_X_SERVER_TIMING' not in request.META:
+            return False
+        user = getattr(request, 'user', None)
+        return settings.DEBUG or bool(user and user.is_staff)
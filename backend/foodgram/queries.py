@@ -0,0 +1,59 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+SPACES = re.compile(r'\s+')
+
+_budgets = None
+
+
+class QueryPatternError(Exception):
+    """N+1 или превышение бюджета запросов к БД."""
+
+
+def fingerprint(sql):
+    """Форма запроса без значений параметров."""
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def repeated_queries(queries, threshold):
+    """Формы запросов, повторившиеся не меньше threshold раз."""
+    counts = Counter(fingerprint(sql) for _, sql in queries)
+    return [
+        (shape, count) for shape, count in counts.most_common()
+        if count >= threshold
+    ]
+
+
+def get_budgets():
+    global _budgets
+    if _budgets is None:
+        _budgets = (
+            import_string(settings.QUERY_BUDGETS)
+            if settings.QUERY_BUDGETS else {}
+        )
+    return _budgets
+
+
+def find_problems(method, view_name, queries):
+    """Описания N+1 и превышений бюджета для запроса."""
+    problems = [
+        f'N+1: {count} одинаковых запросов: {shape}'
+        for shape, count in repeated_queries(
+            queries, settings.N_PLUS_ONE_THRESHOLD
+        )
+    ]
+    budget = get_budgets().get((method, view_name))
+    if budget is not None and len(queries) > budget:
+        problems.append(
+            f'{len(queries)} запросов к БД при бюджете {budget}'
+        )
+    return problems
@@ -29,7 +29,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -40,6 +42,26 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'foodgram.urls'
 
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False').lower() == 'true'
+
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+
+SLOW_REQUEST_QUERIES = 3
+
+PERFORMANCE_STATS_SAMPLES = 1000
+
+# Проверка N+1 и бюджетов запросов: off, warn или raise.
+QUERY_CHECKS = os.getenv('QUERY_CHECKS', 'warn' if DEBUG else 'off')
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+
+QUERY_BUDGETS = 'api.query_budgets.QUERY_BUDGETS'
+
+# Асинхронные вьюхи чтения, включаются по умолчанию в foodgram/asgi.py.
+ASYNC_API = os.getenv('ASYNC_API', 'False').lower() == 'true'
+
+ASYNC_API_THREADS = int(os.getenv('ASYNC_API_THREADS', 32))
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -58,28 +80,75 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': os.getenv('POSTGRES_DB', 'django'),
-#         'USER': os.getenv('POSTGRES_USER', 'django'),
-#         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
-#         'HOST': os.getenv('DB_HOST', ''),
-#         'PORT': os.getenv('DB_PORT', 5432)
-#     }
-# }
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': 'sqlite3', # This is where you put the name of the db file.
-                 # If one doesn't exist, it will be created at migration time.
+        # Файл БД, создается при миграции.
+        'NAME': 'sqlite3',
+    }
+}
+
+# DB_ENGINE=postgresql включает PostgreSQL, например в CI для
+# check_query_budgets.
+if os.getenv('DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'django'),
+            'USER': os.getenv('POSTGRES_USER', 'django'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', 5432)
+        }
+    }
+
+# Реплики для чтения: хосты PostgreSQL или для SQLite файлы,
+# DB_REPLICAS="replica1.sqlite3, replica2.sqlite3".
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(', ')), start=1
+):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        (
+            'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3')
+            else 'HOST'
+        ): replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+REPLICA_EJECT_SECONDS = int(os.getenv('REPLICA_EJECT_SECONDS', 30))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
 
 AUTH_USER_MODEL = 'users.User'
 
+# Новые пароли хешируются первым хешером списка, пароли, сохраненные
+# остальными, пересчитываются при входе: PASSWORD_HASHERS="django.contrib.
+# auth.hashers.Argon2PasswordHasher, django.contrib.auth.hashers.
+# PBKDF2PasswordHasher" (для Argon2 нужен пакет argon2-cffi).
+PASSWORD_HASHERS = os.getenv(
+    'PASSWORD_HASHERS',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher, '
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher, '
+    'django.contrib.auth.hashers.Argon2PasswordHasher, '
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher'
+).split(', ')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.'
@@ -121,10 +190,140 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.paginations.PageLimitPagination',
-    'PAGE_SIZE': 6
+    'PAGE_SIZE': 6,
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.ExpensiveThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('LOGIN_RATE_IP', '30/min'),
+        'login_email': os.getenv('LOGIN_RATE_EMAIL', '10/min'),
+        'expensive': os.getenv('EXPENSIVE_RATE', '60/min'),
+    },
+}
+
+# Корзины throttling: api.throttling.CacheBucketBackend (общий кэш)
+# или api.throttling.LocalBucketBackend (память процесса, для тестов).
+RATE_LIMIT_BACKEND = os.getenv(
+    'RATE_LIMIT_BACKEND', 'api.throttling.CacheBucketBackend'
+)
+
+RATE_LIMIT_CACHE = 'default'
+
+# PDF списка покупок от SHOPPING_LIST_BACKGROUND_ROWS строк или по
+# заголовку Prefer: respond-async собирается в фоне командой
+# run_shopping_list_jobs, ответ - 202 со ссылкой на статус.
+SHOPPING_LIST_BACKGROUND = (
+    os.getenv('SHOPPING_LIST_BACKGROUND', 'False').lower() == 'true'
+)
+
+SHOPPING_LIST_BACKGROUND_ROWS = int(
+    os.getenv('SHOPPING_LIST_BACKGROUND_ROWS', 100)
+)
+
+# Рецепты авторов, у которых подписчиков больше
+# FEED_FANOUT_MAX_FOLLOWERS, не раскладываются по лентам, а читаются
+# вместе с лентой; их список пересчитывается раз в
+# FEED_CELEBRITIES_CACHE_SECONDS. FEED_BACKFILL - сколько последних
+# рецептов автора попадает в ленту при подписке.
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 10000)
+)
+
+FEED_CELEBRITIES_CACHE_SECONDS = int(
+    os.getenv('FEED_CELEBRITIES_CACHE_SECONDS', 600)
+)
+
+FEED_BACKFILL = int(os.getenv('FEED_BACKFILL', 20))
+
+# Рейтинги рецептов (команда refresh_rankings): добавление в список
+# покупок весит RANKING_CART_WEIGHT добавлений в избранное, просмотр -
+# RANKING_VIEW_WEIGHT (только в popular), вес добавления в trending
+# падает вдвое за TRENDING_HALF_LIFE_DAYS дней, добавления старше
+# TRENDING_WINDOW_DAYS дней в нем не учитываются.
+RANKING_CART_WEIGHT = float(os.getenv('RANKING_CART_WEIGHT', 2))
+
+RANKING_VIEW_WEIGHT = float(os.getenv('RANKING_VIEW_WEIGHT', 0.01))
+
+TRENDING_HALF_LIFE_DAYS = float(os.getenv('TRENDING_HALF_LIFE_DAYS', 3))
+
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', 30))
+
+# Похожие рецепты (команда build_similar_recipes): SIMILAR_RECIPES_K
+# на рецепт, доля сходства по избранному и спискам покупок против
+# сходства по ингредиентам. Пользователи с большим числом рецептов
+# и ингредиенты из очень многих рецептов не учитываются.
+SIMILAR_RECIPES_K = int(os.getenv('SIMILAR_RECIPES_K', 10))
+
+SIMILAR_INTERACTIONS_WEIGHT = float(
+    os.getenv('SIMILAR_INTERACTIONS_WEIGHT', 0.7)
+)
+
+SIMILAR_MAX_USER_RECIPES = int(os.getenv('SIMILAR_MAX_USER_RECIPES', 1000))
+
+SIMILAR_MAX_INGREDIENT_RECIPES = int(
+    os.getenv('SIMILAR_MAX_INGREDIENT_RECIPES', 5000)
+)
+
+# Индекс поиска по ингредиентам в памяти процесса: подтягивает
+# изменения рецептов раз в PANTRY_SYNC_SECONDS и перестраивается
+# раз в PANTRY_REBUILD_SECONDS; ответ - до PANTRY_MAX_RESULTS рецептов.
+PANTRY_SYNC_SECONDS = int(os.getenv('PANTRY_SYNC_SECONDS', 5))
+
+PANTRY_REBUILD_SECONDS = int(os.getenv('PANTRY_REBUILD_SECONDS', 3600))
+
+PANTRY_MAX_RESULTS = int(os.getenv('PANTRY_MAX_RESULTS', 1000))
+
+# Просмотры рецептов копятся в памяти процесса, фоновый поток
+# записывает их в БД раз в VIEW_COUNTS_FLUSH_SECONDS, запрос — по
+# набору VIEW_COUNTS_FLUSH_SIZE рецептов.
+VIEW_COUNTS_FLUSH_SECONDS = int(os.getenv('VIEW_COUNTS_FLUSH_SECONDS', 10))
+
+VIEW_COUNTS_FLUSH_SIZE = int(os.getenv('VIEW_COUNTS_FLUSH_SIZE', 1000))
+
+# Админка: без фильтров число строк таблиц от ADMIN_ESTIMATED_COUNT_MIN
+# берется из статистики PostgreSQL, варианты фильтров по столбцам
+# кешируются на ADMIN_FILTER_CACHE_SECONDS.
+ADMIN_ESTIMATED_COUNT_MIN = int(
+    os.getenv('ADMIN_ESTIMATED_COUNT_MIN', 100000)
+)
+
+ADMIN_FILTER_CACHE_SECONDS = int(os.getenv('ADMIN_FILTER_CACHE_SECONDS', 600))
+
+# Воркер run_deletion_jobs удаляет строки порциями по
+# DELETION_BATCH_SIZE, каждая порция - отдельная транзакция.
+DELETION_BATCH_SIZE = int(os.getenv('DELETION_BATCH_SIZE', 1000))
+
+# Пакетные эндпоинты избранного и корзины и ?ids= списка рецептов
+# принимают не больше BATCH_MAX_IDS рецептов за запрос.
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', 100))
+
+# /api/recipes/changes/ не отдает изменения моложе SYNC_LAG_SECONDS
+# (их транзакции могли не закоммититься), надгробия удаленных рецептов
+# хранятся SYNC_TOMBSTONE_DAYS дней, более старая позиция требует
+# полной синхронизации.
+SYNC_LAG_SECONDS = int(os.getenv('SYNC_LAG_SECONDS', 5))
+
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 90))
+
+# Картинки рецептов хранятся по хешу содержимого. Файл, повторно
+# загруженный последние MEDIA_DELETE_GRACE_SECONDS секунд, не
+# удаляется: ссылка на него может быть в незакоммиченной транзакции.
+MEDIA_DELETE_GRACE_SECONDS = int(
+    os.getenv('MEDIA_DELETE_GRACE_SECONDS', 600)
+)
+
+# Сколько токенов корзины expensive стоит запрос, ключ можно уточнить
+# форматом ответа.
+THROTTLE_COSTS = {
+    ('GET', 'recipes-get-shopping-cart', 'pdf'): 10,
+    ('GET', 'recipes-get-shopping-cart'): 1,
+    ('POST', 'recipes-list'): 5,
+    ('PUT', 'recipes-detail'): 5,
+    ('PATCH', 'recipes-detail'): 5,
+    ('POST', 'recipes-shopping-cart-batch'): 5,
+    ('DELETE', 'recipes-shopping-cart-batch'): 5,
+    ('DELETE', 'recipes-clear-shopping-cart'): 5,
 }
 
 SIMPLE_JWT = {
@@ -132,3 +331,15 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Token',),
     'AUTH_TOKEN_CLASSES': ('api.tokens.CustomAccessToken',)
 }
+
+# Кэш пользователей JWT-аутентификации должен быть общим для воркеров
+# (memcached, redis): при деактивации и смене пароля пользователь
+# сбрасывается только в нем. С LocMemCache кэширование отключено.
+AUTH_USER_CACHE = 'default'
+
+AUTH_USER_CACHE_SECONDS = int(os.getenv('AUTH_USER_CACHE_SECONDS', 30))
+
+# Как часто процесс подтягивает новые отозванные токены из БД.
+TOKEN_BLACKLIST_SYNC_SECONDS = int(
+    os.getenv('TOKEN_BLACKLIST_SYNC_SECONDS', 5)
+)
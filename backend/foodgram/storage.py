@@ -0,0 +1,96 @@
+"""Хранилище файлов, адресованных по содержимому.
+
+Имя файла — SHA-256 содержимого с расширением исходного имени в
+подкаталоге из двух первых символов хеша, поэтому одинаковые картинки,
+загруженные повторно, хранятся одним файлом, а содержимое по имени
+никогда не меняется и nginx отдает его с immutable-заголовками.
+Файл может принадлежать нескольким рецептам: удалять его можно только
+без ссылок, это проверяет recipes.deletion.delete_files.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, basename = posixpath.split(name)
+        extension = posixpath.splitext(basename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return super().save(
+            self.content_name(name, content), content, max_length
+        )
+
+    def get_available_name(self, name, max_length=None):
+        # Одно имя — одно содержимое: существующий файл переиспользуется.
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Имя файла {name} длиннее {max_length} символов.'
+            )
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # Свежее время изменения защищает файл от delete(), пока
+            # ссылка на него не закоммичена.
+            os.utime(full_path)
+            return name
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(
+                    directory, self.directory_permissions_mode, exist_ok=True
+                )
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        # Запись во временный файл и атомарная замена: параллельные
+        # загрузки того же содержимого пишут одинаковые байты.
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+            for chunk in content.chunks():
+                file.write(chunk)
+        os.chmod(file.name, self.file_permissions_mode or 0o644)
+        os.replace(file.name, full_path)
+        return name
+
+    def delete(self, name):
+        """Удаляет файл, если его не переиспользовали недавно.
+
+        Файл, переиспользованный последние MEDIA_DELETE_GRACE_SECONDS,
+        мог получить ссылку в еще не закоммиченной транзакции и
+        остается на диске.
+        """
+        try:
+            modified = self.get_modified_time(name)
+        except FileNotFoundError:
+            return
+        if modified > timezone.now() - timedelta(
+            seconds=settings.MEDIA_DELETE_GRACE_SECONDS
+        ):
+            return
+        super().delete(name)
@@ -0,0 +1,126 @@
+import heapq
+import math
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+
+_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Замеры одного запроса: SQL, сериализация, рендеринг."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = []
+        self.metrics = defaultdict(float)
+        self.active = set()
+        self.render_started = None
+
+    @property
+    def sql_time(self):
+        return sum(duration for duration, _ in self.queries)
+
+    def slowest_queries(self, count):
+        return heapq.nlargest(count, self.queries, key=lambda query: query[0])
+
+
+def start_timing():
+    return _timings.set(RequestTimings())
+
+
+def stop_timing(token):
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings
+
+
+def get_timings():
+    return _timings.get()
+
+
+@contextmanager
+def measure(name):
+    """Добавляет время блока к метрике name текущего запроса.
+
+    Вложенные замеры той же метрики не суммируются повторно.
+    """
+    timings = _timings.get()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings.metrics[name] += perf_counter() - started
+        timings.active.discard(name)
+
+
+def timing_execute_wrapper(execute, sql, params, many, context):
+    """Учитывает время SQL-запросов в замерах текущего запроса."""
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries.append((perf_counter() - started, sql))
+
+
+def install_execute_wrapper(connection, **kwargs):
+    if timing_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timing_execute_wrapper)
+
+
+def percentile(values, percent):
+    """Перцентиль по отсортированному списку (ближайший ранг)."""
+    if not values:
+        return None
+    return values[max(1, math.ceil(percent / 100 * len(values))) - 1]
+
+
+class ViewStats:
+    """Последние замеры по каждой вьюхе в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, view_name, total_ms, queries):
+        with self._lock:
+            samples = self._samples.get(view_name)
+            if samples is None:
+                samples = self._samples[view_name] = deque(
+                    maxlen=settings.PERFORMANCE_STATS_SAMPLES
+                )
+            samples.append((total_ms, queries))
+
+    def snapshot(self):
+        with self._lock:
+            samples = {
+                view_name: list(items)
+                for view_name, items in self._samples.items()
+            }
+        stats = {}
+        for view_name, items in sorted(samples.items()):
+            durations = sorted(total_ms for total_ms, _ in items)
+            stats[view_name] = {
+                'count': len(items),
+                'p50_ms': round(percentile(durations, 50), 1),
+                'p95_ms': round(percentile(durations, 95), 1),
+                'p99_ms': round(percentile(durations, 99), 1),
+                'avg_queries': round(
+                    sum(queries for _, queries in items) / len(items), 1
+                ),
+            }
+        return stats
+
+
+view_stats = ViewStats()
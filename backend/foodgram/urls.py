@@ -1,7 +1,14 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from foodgram.views import PerformanceStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(
+        'api/performance/',
+        PerformanceStatsView.as_view(),
+        name='performance_stats'
+    ),
     path('api/', include('api.urls')),
 ]
@@ -0,0 +1,14 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from foodgram.timing import view_stats
+
+
+class PerformanceStatsView(APIView):
+    """Перцентили времени ответа по вьюхам для текущего процесса."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(view_stats.snapshot())
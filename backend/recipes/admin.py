@@ -1,7 +1,12 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import F
+from foodgram.admin_helpers import (BackgroundDeleteAdmin, LargeTableAdmin,
+                                    cached_choices_filter)
+from recipes import shopping_list
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
                             Recipe, ShoppingCart, Tag)
+from recipes.sync import touch
 
 
 @admin.register(Tag)
@@ -12,75 +17,154 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ('name', 'slug', 'color')
     list_filter = ('name', 'slug', 'color')
 
+
+class CookingTimeFilter(admin.SimpleListFilter):
+    """Время приготовления по диапазонам, без запросов к БД."""
+
+    title = 'Время приготовления'
+    parameter_name = 'cooking_time'
+    ranges = {
+        'quick': (None, 15),
+        'hour': (16, 60),
+        'long': (61, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return (
+            ('quick', 'до 15 минут'),
+            ('hour', '16-60 минут'),
+            ('long', 'больше часа'),
+        )
+
+    def queryset(self, request, queryset):
+        low, high = self.ranges.get(self.value(), (None, None))
+        if low is not None:
+            queryset = queryset.filter(cooking_time__gte=low)
+        if high is not None:
+            queryset = queryset.filter(cooking_time__lte=high)
+        return queryset
+
+
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BackgroundDeleteAdmin):
     """Рецепт."""
 
     list_display = (
         'author',
         'name',
-        'text',
         'cooking_time',
         'favorite_count',
+        'views',
         'pub_date'
     )
-    list_filter = ('author__username', 'author__email', 'name', 'text', 'cooking_time')
-    search_fields = ('author__username', 'author__email', 'name', 'text', 'cooking_time')
+    list_filter = (CookingTimeFilter, 'tags', 'pub_date')
+    search_fields = ('name', 'author__username', 'author__email')
+    autocomplete_fields = ('author', 'tags')
+    # Иначе сохранение формы затрет просмотры, записанные после ее открытия.
+    readonly_fields = ('views', 'viewed')
 
     def get_queryset(self, request):
-        return Recipe.objects.annotate(
-            favorite_count=Count('favorite_recipes')
-        ).all().select_related('author')
+        # Число добавлений в избранное из RecipeRanking (refresh_rankings):
+        # Count по всей таблице FavoriteRecipe на каждой странице дорог.
+        return super().get_queryset(request).select_related(
+            'author'
+        ).annotate(favorite_count=F('ranking__favorites'))
 
+    @admin.display(description='В избранном', ordering='ranking__favorites')
     def favorite_count(self, obj):
-        return obj.favorite_count
+        return obj.favorite_count or 0
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     """Ингредиент."""
 
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name', 'measurement_unit')
-    search_fields = ('name', 'measurement_unit')
+    list_filter = (
+        cached_choices_filter('measurement_unit', 'Единица измерения'),
+    )
+    search_fields = ('^name',)
+
 
 @admin.register(IngredientAmount)
-class IngredientAmountAdmin(admin.ModelAdmin):
+class IngredientAmountAdmin(LargeTableAdmin):
     """Ингредиенты в рецептах."""
 
     list_display = ('ingredient', 'recipe', 'amount')
-    list_filter = ('ingredient', 'recipe', 'amount')
-    search_fields = ('ingredient', 'recipe', 'amount')
+    list_select_related = ('ingredient', 'recipe__author')
+    search_fields = ('^ingredient__name', 'recipe__name')
+    autocomplete_fields = ('ingredient', 'recipe')
+
+    def change_ingredients(self, recipe_ids, change):
+        """Выполняет change и переносит его в списки покупок.
+
+        Списки пользователей с рецептами в корзине меняются так же, как
+        при правке рецепта через API, а рецепты отмечаются измененными
+        для синхронизации клиентов.
+        """
+        with transaction.atomic():
+            carted = {}
+            for recipe_id in recipe_ids:
+                users = shopping_list.carting_users(recipe_id)
+                if users:
+                    carted[recipe_id] = (
+                        users, shopping_list.recipe_amounts(recipe_id)
+                    )
+            change()
+            for recipe_id, (users, old) in carted.items():
+                shopping_list.change_recipe(
+                    users, old, shopping_list.recipe_amounts(recipe_id)
+                )
+            touch(recipe_ids)
+
+    def save_model(self, request, obj, form, change):
+        # Строку могли перенести в другой рецепт: меняются оба.
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.update(IngredientAmount.objects.filter(
+                pk=obj.pk
+            ).values_list('recipe_id', flat=True))
+        self.change_ingredients(
+            recipe_ids,
+            lambda: super(IngredientAmountAdmin, self).save_model(
+                request, obj, form, change
+            )
+        )
 
-    def get_queryset(self, request):
-        return IngredientAmount.objects.all().prefetch_related(
-            'amount_ingredients', 'amount_recipes'
+    def delete_model(self, request, obj):
+        self.change_ingredients(
+            {obj.recipe_id},
+            lambda: super(IngredientAmountAdmin, self).delete_model(
+                request, obj
+            )
+        )
+
+    def delete_queryset(self, request, queryset):
+        self.change_ingredients(
+            set(queryset.values_list('recipe_id', flat=True)),
+            lambda: super(IngredientAmountAdmin, self).delete_queryset(
+                request, queryset
+            )
         )
 
 
 @admin.register(FavoriteRecipe)
-class FavoriteRecipeAdmin(admin.ModelAdmin):
+class FavoriteRecipeAdmin(LargeTableAdmin):
     """Избранные рецепты."""
 
-    list_display = ('recipe', 'user')
-    list_filter = ('recipe', 'user__username', 'user__email')
-    search_fields = ('recipe', 'user__username', 'user__email')
-
-    def get_queryset(self, request):
-        return FavoriteRecipe.objects.all().prefetch_related(
-            'favorite_users', 'favorite_recipes'
-        )
+    list_display = ('recipe', 'user', 'created')
+    list_select_related = ('recipe__author', 'user')
+    list_filter = ('created',)
+    search_fields = ('recipe__name', 'user__username', 'user__email')
+    autocomplete_fields = ('recipe', 'user')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     """Списки покупок."""
 
-    list_display = ('recipe', 'user')
-    list_filter = ('recipe', 'user__username', 'user__email')
-    search_fields = ('recipe', 'user__username', 'user__email')
-
-    def get_queryset(self, request):
-        return FavoriteRecipe.objects.all().prefetch_related(
-            'shopping_carts_users', 'shopping_carts_recipes'
-        )
+    list_display = ('recipe', 'user', 'created')
+    list_select_related = ('recipe__author', 'user')
+    list_filter = ('created',)
+    search_fields = ('recipe__name', 'user__username', 'user__email')
+    autocomplete_fields = ('recipe', 'user')
@@ -1,6 +1,30 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_delete
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from recipes.feed import follow_deleted, follow_saved, recipe_saved
+        from recipes.models import Recipe, ShoppingCart
+        from recipes.shopping_list import cart_deleting, cart_saved
+        from users.models import Follow
+
+        post_save.connect(
+            cart_saved, sender=ShoppingCart, dispatch_uid='shopping_list_add'
+        )
+        pre_delete.connect(
+            cart_deleting, sender=ShoppingCart,
+            dispatch_uid='shopping_list_remove'
+        )
+        post_save.connect(
+            recipe_saved, sender=Recipe, dispatch_uid='feed_fan_out'
+        )
+        post_save.connect(
+            follow_saved, sender=Follow, dispatch_uid='feed_backfill'
+        )
+        post_delete.connect(
+            follow_deleted, sender=Follow, dispatch_uid='feed_unfollow'
+        )
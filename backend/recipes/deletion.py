@@ -0,0 +1,202 @@
+"""Фоновое удаление пользователей и рецептов с большими каскадами.
+
+Вьюха только скрывает объект и ставит DeletionJob в очередь, а
+воркер run_deletion_jobs удаляет зависимые строки порциями по
+DELETION_BATCH_SIZE, каждая в своей короткой транзакции: снизу вверх
+по связям с on_delete=CASCADE, чтобы сборщик Django на каждой порции
+не находил вложенных строк. Файлы удаленных строк стираются после
+коммита порции, если на них не ссылаются другие строки.
+"""
+import posixpath
+import re
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.signals import post_delete, pre_delete
+from django.utils import timezone
+
+from foodgram.storage import ContentAddressedStorage
+from recipes.models import DeletionJob, Recipe
+from recipes.shopping_list import chunks
+from recipes.sync import bury
+from users.models import User
+
+
+# Строки моделей с сигналами удаления сборщик Django загружает
+# и обрабатывает по одной, их порции во столько раз меньше.
+SIGNALS_BATCH_DIVISOR = 10
+HASHED_NAME = re.compile(r'[0-9a-f]{64}(\.[0-9a-z]+)?')
+
+
+def has_signals(model):
+    return (
+        pre_delete.has_listeners(model) or post_delete.has_listeners(model)
+    )
+
+
+def cascades(model):
+    """Связи, по которым удаление model каскадно удаляет строки.
+
+    Сначала модели с сигналами удаления: обработчикам нужны еще не
+    удаленные соседние строки (cart_deleting читает ингредиенты
+    рецепта).
+    """
+    relations = [
+        relation for relation in get_candidate_relations_to_delete(
+            model._meta
+        )
+        if relation.on_delete is models.CASCADE
+    ]
+    return sorted(
+        relations, key=lambda relation: not has_signals(relation.related_model)
+    )
+
+
+def file_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def delete_files(model, names):
+    """Стирает файлы {поле: имена}, на которые больше никто не ссылается.
+
+    Возвращает число файлов без ссылок.
+    """
+    count = 0
+    for field in file_fields(model):
+        if not names.get(field.name):
+            continue
+        unused = names[field.name] - set(
+            model._base_manager.filter(
+                **{f'{field.name}__in': names[field.name]}
+            ).values_list(field.name, flat=True)
+        )
+        for name in unused:
+            field.storage.delete(name)
+        count += len(unused)
+    return count
+
+
+def stored_files(field):
+    """Имена файлов поля в хранилище, адресованном по содержимому."""
+    storage = field.storage
+    root = field.upload_to
+    if not storage.exists(root):
+        return
+    for directory in storage.listdir(root)[0]:
+        path = posixpath.join(root, directory)
+        for name in storage.listdir(path)[1]:
+            # Временные файлы незаконченных загрузок не подходят.
+            if HASHED_NAME.fullmatch(name) and name.startswith(directory):
+                yield posixpath.join(path, name)
+
+
+def sweep_files(model, batch_size):
+    """Стирает файлы полей model, на которые не ссылается ни одна строка.
+
+    Файлы могли остаться после сбоя между коммитом и удалением файла
+    или от загрузок без сохраненного рецепта. Файлы моложе
+    MEDIA_DELETE_GRACE_SECONDS пропускаются: ссылка на них может быть
+    в незакоммиченной транзакции. Возвращает (проверено, удалено).
+    """
+    border = timezone.now() - timedelta(
+        seconds=settings.MEDIA_DELETE_GRACE_SECONDS
+    )
+    checked = deleted = 0
+    for field in file_fields(model):
+        if not isinstance(field.storage, ContentAddressedStorage):
+            continue
+        for batch in chunks(stored_files(field), batch_size):
+            checked += len(batch)
+            deleted += delete_files(model, {
+                field.name: {
+                    name for name in batch
+                    if field.storage.get_modified_time(name) < border
+                }
+            })
+    return checked, deleted
+
+
+def purge(queryset, batch_size, on_batch=None):
+    """Удаляет строки queryset порциями, сначала зависимые.
+
+    Возвращает число удаленных строк, on_batch(модель, строк, секунд)
+    вызывается после каждой порции.
+    """
+    model = queryset.model
+    deleted = 0
+    size = batch_size
+    if has_signals(model):
+        size = max(1, batch_size // SIGNALS_BATCH_DIVISOR)
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:size])
+        if not ids:
+            return deleted
+        for relation in cascades(model):
+            deleted += purge(
+                relation.related_model._base_manager.filter(
+                    **{f'{relation.field.name}__in': ids}
+                ),
+                batch_size, on_batch
+            )
+        batch = model._base_manager.filter(pk__in=ids)
+        names = {
+            field.name: set(
+                batch.exclude(**{field.name: ''}).values_list(
+                    field.name, flat=True
+                )
+            )
+            for field in file_fields(model)
+        }
+        started = time.perf_counter()
+        with transaction.atomic():
+            count, _ = batch.delete()
+        if on_batch is not None:
+            on_batch(model, count, time.perf_counter() - started)
+        deleted += count
+        if any(names.values()):
+            delete_files(model, names)
+
+
+def schedule(instance):
+    """Скрывает пользователя или рецепт и ставит его удаление в очередь.
+
+    Рецепты пропадают из Recipe.objects сразу и получают надгробия
+    для синхронизации клиентов, пользователь деактивируется, а строки
+    удаляет воркер run_deletion_jobs.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if isinstance(instance, User):
+            instance.is_active = False
+            instance.save(update_fields=('is_active',))
+            recipes = Recipe._base_manager.filter(author=instance)
+        else:
+            recipes = Recipe._base_manager.filter(pk=instance.pk)
+        recipes.filter(deleted__isnull=True).update(deleted=now)
+        bury(recipes.filter(deleted=now).values_list('pk', flat=True), now)
+        job, _ = DeletionJob.objects.get_or_create(
+            model=instance._meta.label_lower,
+            object_id=instance.pk,
+            status=DeletionJob.PENDING
+        )
+    return job
+
+
+def run_job(job, on_batch=None):
+    model = apps.get_model(job.model)
+    deleted = purge(
+        model._base_manager.filter(pk=job.object_id),
+        settings.DELETION_BATCH_SIZE, on_batch
+    )
+    DeletionJob.objects.filter(pk=job.pk).update(
+        status=DeletionJob.DONE, deleted_rows=deleted,
+        finished=timezone.now()
+    )
+    return deleted
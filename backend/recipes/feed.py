@@ -0,0 +1,135 @@
+"""Лента новых рецептов авторов из подписок.
+
+Новый рецепт раскладывается по лентам подписчиков автора (FeedEntry)
+после коммита, порциями. У авторов больше FEED_FANOUT_MAX_FOLLOWERS
+подписчиков рецепты в ленты не пишутся: при чтении они подмешиваются
+запросом по индексу рецептов автора.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from recipes.models import FeedEntry, Recipe
+from recipes.shopping_list import chunks
+from users.models import Follow
+
+CELEBRITIES_KEY = 'feed-celebrities'
+FANOUT_BATCH_SIZE = 1000
+
+
+def celebrity_ids():
+    """Авторы, рецепты которых подмешиваются в ленту при чтении."""
+    return cache.get_or_set(
+        CELEBRITIES_KEY,
+        lambda: frozenset(
+            Follow.objects.values('following').annotate(
+                followers=Count('id')
+            ).filter(
+                followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+            ).values_list('following', flat=True)
+        ),
+        settings.FEED_CELEBRITIES_CACHE_SECONDS
+    )
+
+
+def fan_out(recipe_id, author_id, pub_date):
+    """Добавляет рецепт в ленты подписчиков автора."""
+    if author_id in celebrity_ids():
+        return 0
+    followers = Follow.objects.filter(
+        following_id=author_id
+    ).order_by('user_id').values_list('user_id', flat=True)
+    added = 0
+    for batch in chunks(followers.iterator(), FANOUT_BATCH_SIZE):
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                          pub_date=pub_date)
+                for user_id in batch
+            ),
+            ignore_conflicts=True
+        )
+        added += len(batch)
+    return added
+
+
+def backfill(user_id, author_id):
+    """Последние рецепты автора в ленту нового подписчика."""
+    if author_id in celebrity_ids():
+        return
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      pub_date=pub_date)
+            for recipe_id, pub_date in Recipe.objects.filter(
+                author_id=author_id
+            ).order_by('-pub_date', '-id').values_list(
+                'id', 'pub_date'
+            )[:settings.FEED_BACKFILL]
+        ),
+        ignore_conflicts=True
+    )
+
+
+def recipe_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(
+            lambda: fan_out(instance.pk, instance.author_id,
+                            instance.pub_date)
+        )
+
+
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        backfill(instance.user_id, instance.following_id)
+
+
+def follow_deleted(sender, instance, **kwargs):
+    FeedEntry.objects.filter(
+        user_id=instance.user_id, recipe__author_id=instance.following_id
+    ).delete()
+
+
+def before(date_field, id_field, cursor):
+    """Условие «раньше курсора» для порядка (дата, id) по убыванию."""
+    date, pk = cursor
+    return Q(**{f'{date_field}__lt': date}) | Q(
+        **{date_field: date, f'{id_field}__lt': pk}
+    )
+
+
+def read_feed(user, limit, cursor=None):
+    """Страница ленты: [(дата, id рецепта)] и есть ли продолжение.
+
+    Лента пользователя читается по индексу (user, pub_date), рецепты
+    авторов из celebrity_ids — по индексу (author, pub_date), обе
+    выборки ограничены limit + 1 и сливаются по дате.
+    """
+    # Записи скрытых рецептов живут до фонового удаления.
+    entries = FeedEntry.objects.filter(
+        user=user, recipe__deleted__isnull=True
+    )
+    if cursor:
+        entries = entries.filter(before('pub_date', 'recipe_id', cursor))
+    rows = set(
+        entries.order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:limit + 1]
+    )
+    celebrities = celebrity_ids()
+    if celebrities:
+        recipes = Recipe.objects.filter(
+            author__in=Follow.objects.filter(
+                user=user, following__in=celebrities
+            ).values('following')
+        )
+        if cursor:
+            recipes = recipes.filter(before('pub_date', 'id', cursor))
+        rows.update(
+            recipes.order_by('-pub_date', '-id').values_list(
+                'pub_date', 'id'
+            )[:limit + 1]
+        )
+    rows = sorted(rows, reverse=True)
+    return rows[:limit], len(rows) > limit
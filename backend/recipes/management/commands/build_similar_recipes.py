@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.similar import build
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по избранному, спискам покупок '
+        'и ингредиентам. Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Рецептов в одной транзакции.'
+        )
+        parser.add_argument('--k', type=int, help='Похожих на рецепт.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = build(options['chunk_size'], options['k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено пар похожих рецептов: {count} за '
+            f'{time.perf_counter() - started:.1f} с.'
+        ))
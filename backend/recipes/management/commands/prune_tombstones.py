@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет надгробия рецептов старше SYNC_TOMBSTONE_DAYS дней. '
+        'Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено надгробий: {deleted}.'
+        ))
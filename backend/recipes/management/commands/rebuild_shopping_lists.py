@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from recipes.models import ShoppingCart, ShoppingListItem
+from recipes.shopping_list import chunks, mismatches, rebuild
+from users.models import User
+
+# Сколько расхождений выводить при --check.
+SHOWN_MISMATCHES = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает материализованные списки покупок по корзинам '
+        'или с --check только сверяет их.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', type=int, dest='users',
+            help='id пользователя; можно повторять.'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только найти расхождения, ненулевой код выхода при них.'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or User.objects.filter(
+            Q(id__in=ShoppingCart.objects.values('user'))
+            | Q(id__in=ShoppingListItem.objects.values('user'))
+        ).order_by('id').values_list('id', flat=True).iterator()
+        found = users = 0
+        for batch in chunks(user_ids, options['batch_size']):
+            users += len(batch)
+            if not options['check']:
+                rebuild(batch)
+                continue
+            for (user_id, ingredient_id), want, have in mismatches(batch):
+                found += 1
+                if found <= SHOWN_MISMATCHES:
+                    self.stdout.write(
+                        f'пользователь {user_id}, ингредиент '
+                        f'{ingredient_id}: ожидалось {want}, хранится {have}'
+                    )
+        if found:
+            raise CommandError(
+                f'Расхождений в списках покупок: {found} у {users} '
+                'пользователей, исправьте запуском без --check.'
+            )
+        done = 'сверены' if options['check'] else 'пересобраны'
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок {done}: {users} пользователей.'
+        ))
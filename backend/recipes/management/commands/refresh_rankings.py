@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.rankings import refresh
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинги popular и trending рецептов с '
+        'добавлениями или просмотрами за последние --since минут или, '
+        'с --full, всех.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=int, default=20,
+            help='Минут назад; с запасом больше интервала запуска.'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты, учитывая и удаления.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        since = None
+        if not options['full']:
+            since = timezone.now() - timedelta(minutes=options['since'])
+        count = refresh(since)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рейтингов: {count} за '
+            f'{time.perf_counter() - started:.1f} с.'
+        ))
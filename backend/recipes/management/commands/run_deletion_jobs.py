@@ -0,0 +1,97 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.deletion import run_job
+from recipes.models import DeletionJob
+
+logger = logging.getLogger('foodgram.deletion')
+
+# Задача, воркер которой так долго не отмечался, считается брошенной
+# упавшим воркером; повторный запуск продолжит с оставшихся строк.
+STALE_MINUTES = 10
+# Как часто воркер отмечается в задаче между порциями.
+HEARTBEAT_SECONDS = 30
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер очереди DeletionJob: порциями удаляет пользователей и '
+        'рецепты, скрытые вьюхами и админкой, с зависимыми строками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и выйти.'
+        )
+        parser.add_argument('--interval', type=float, default=1)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = self.claim()
+            if job is not None:
+                self.run(job)
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
+
+    def requeue_stale(self):
+        """Возвращает в очередь задачи упавших воркеров."""
+        stale = timezone.now() - timedelta(minutes=STALE_MINUTES)
+        requeued = DeletionJob.objects.filter(
+            Q(heartbeat__lt=stale)
+            | Q(heartbeat__isnull=True, created__lt=stale),
+            status=DeletionJob.RUNNING
+        ).update(status=DeletionJob.PENDING)
+        if requeued:
+            logger.warning('Возвращено в очередь удалений: %s', requeued)
+
+    def claim(self):
+        """Берет задачу условным UPDATE, как run_shopping_list_jobs.
+
+        Брошенные задачи проверяются на каждом проходе.
+        """
+        self.requeue_stale()
+        pending = DeletionJob.objects.filter(
+            status=DeletionJob.PENDING
+        ).order_by('created')
+        for job in pending[:10]:
+            if DeletionJob.objects.filter(
+                pk=job.pk, status=DeletionJob.PENDING
+            ).update(status=DeletionJob.RUNNING, heartbeat=timezone.now()):
+                job.status = DeletionJob.RUNNING
+                return job
+        return None
+
+    def run(self, job):
+        started = time.perf_counter()
+        beat = time.monotonic()
+
+        def on_batch(model, rows, seconds):
+            nonlocal beat
+            if time.monotonic() - beat >= HEARTBEAT_SECONDS:
+                beat = time.monotonic()
+                DeletionJob.objects.filter(pk=job.pk).update(
+                    heartbeat=timezone.now()
+                )
+
+        try:
+            deleted = run_job(job, on_batch)
+        except Exception:
+            logger.exception('Удаление %s не удалось', job)
+            DeletionJob.objects.filter(pk=job.pk).update(
+                status=DeletionJob.FAILED, finished=timezone.now()
+            )
+            return
+        self.stdout.write(
+            f'{job.model} {job.object_id}: {deleted} строк за '
+            f'{time.perf_counter() - started:.2f} с'
+        )
@@ -0,0 +1,360 @@
+import csv
+import itertools
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.feed import CELEBRITIES_KEY, celebrity_ids
+from recipes.models import (FavoriteRecipe, FeedEntry, Ingredient,
+                            IngredientAmount, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.shopping_list import chunks, rebuild
+from users.models import Follow, User
+
+PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+
+# Объемы при --scale 1, около 250 тысяч строк связей.
+USERS = 2000
+AUTHOR_SHARE = 0.2
+RECIPES = 10000
+TAGS = 12
+FOLLOWS_PER_USER = 20
+FAVORITES_PER_USER = 50
+CART_PER_USER = 5
+
+# Показатель Ципфа для популярности авторов и рецептов.
+POPULARITY_EXPONENT = 1.1
+# За сколько дней до запуска разбросаны добавления в избранное
+# и списки покупок.
+HISTORY_DAYS = 60
+# Параметр Парето для числа подписок, избранного и покупок
+# у пользователя: немного пользователей с очень большими списками.
+HEAVY_TAIL_ALPHA = 1.5
+# По скольку пользователей пересобираются списки покупок.
+REBUILD_BATCH_SIZE = 500
+
+
+def zipf_cum_weights(size, exponent=POPULARITY_EXPONENT):
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def heavy_tail(rng, mean, limit):
+    """Случайный размер списка со средним около mean."""
+    scale = mean * (HEAVY_TAIL_ALPHA - 1) / HEAVY_TAIL_ALPHA
+    return min(limit, int(scale * rng.paretovariate(HEAVY_TAIL_ALPHA)))
+
+
+def sample_distinct(rng, population, cum_weights, count, exclude=None):
+    """До count различных элементов с учетом популярности."""
+    chosen = set()
+    for _ in range(10):
+        missing = count - len(chosen)
+        if missing <= 0:
+            break
+        chosen.update(
+            rng.choices(population, cum_weights=cum_weights, k=missing)
+        )
+        chosen.discard(exclude)
+    return chosen
+
+
+def bulk_insert(model, objects, batch_size):
+    """bulk_create порциями, без материализации всех объектов."""
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            return total
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        total += len(batch)
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет БД синтетическими пользователями, подписками, '
+        'рецептами, избранным и списками покупок для бенчмарков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--ingredients',
+            default=settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить ранее созданные данные и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        if options['clear']:
+            self.clear()
+            return
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(
+                'Данные бенчмарка уже есть, удалите их через --clear.'
+            )
+        self.rng = random.Random(options['seed'])
+        scale = options['scale']
+        phases = (
+            ('ингредиенты', self.seed_ingredients, options['ingredients']),
+            ('теги', self.seed_tags, TAGS),
+            ('пользователи', self.seed_users, int(USERS * scale)),
+            ('рецепты', self.seed_recipes, int(RECIPES * scale)),
+            ('ингредиенты рецептов', self.seed_amounts, None),
+            ('теги рецептов', self.seed_recipe_tags, None),
+            ('подписки', self.seed_follows, None),
+            ('избранное', self.seed_favorites, None),
+            ('списки покупок', self.seed_carts, None),
+            ('суммы списков покупок', self.seed_shopping_lists, None),
+            ('ленты', self.seed_feeds, None),
+        )
+        started = time.perf_counter()
+        for title, phase, argument in phases:
+            phase_started = time.perf_counter()
+            with transaction.atomic():
+                count = phase(argument)
+            self.stdout.write(
+                f'{title}: {count} строк за '
+                f'{time.perf_counter() - phase_started:.1f} с'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с.'
+        ))
+
+    def clear(self):
+        users = User.objects.filter(username__startswith=PREFIX)
+        with transaction.atomic():
+            for model in (
+                ShoppingListItem, FeedEntry, FavoriteRecipe, ShoppingCart,
+                Follow
+            ):
+                model.objects.filter(user__in=users).delete()
+            recipes = Recipe.objects.filter(author__in=users)
+            IngredientAmount.objects.filter(recipe__in=recipes).delete()
+            Recipe.tags.through.objects.filter(recipe__in=recipes).delete()
+            recipes.delete()
+            users.delete()
+            Tag.objects.filter(slug__startswith=PREFIX).delete()
+        self.stdout.write(self.style.SUCCESS('Данные бенчмарка удалены.'))
+
+    def seed_ingredients(self, path):
+        # Недостающие ингредиенты из CSV добавляются к уже заведенным:
+        # без них рецепты собирались бы из нескольких ингредиентов БД.
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        with open(path, encoding='utf-8') as file:
+            count = bulk_insert(
+                Ingredient,
+                (
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in csv.reader(file)
+                    if (name, unit) not in existing
+                ),
+                self.batch_size
+            )
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        return count
+
+    def seed_tags(self, count):
+        count = bulk_insert(
+            Tag,
+            (
+                Tag(
+                    name=f'Тег {number}',
+                    slug=f'{PREFIX}{number}',
+                    color=f'#{self.rng.randrange(0x1000000):06X}'
+                )
+                for number in range(count)
+            ),
+            self.batch_size
+        )
+        self.tag_ids = list(
+            Tag.objects.filter(
+                slug__startswith=PREFIX
+            ).order_by('id').values_list('id', flat=True)
+        )
+        return count
+
+    def seed_users(self, count):
+        password = make_password(PASSWORD)
+        count = bulk_insert(
+            User,
+            (
+                User(
+                    username=f'{PREFIX}{number}',
+                    email=f'{PREFIX}{number}@example.com',
+                    first_name='Bench',
+                    last_name=str(number),
+                    password=password
+                )
+                for number in range(count)
+            ),
+            self.batch_size
+        )
+        self.user_ids = list(
+            User.objects.filter(
+                username__startswith=PREFIX
+            ).order_by('id').values_list('id', flat=True)
+        )
+        self.rng.shuffle(self.user_ids)
+        self.author_ids = self.user_ids[
+            :max(1, int(len(self.user_ids) * AUTHOR_SHARE))
+        ]
+        self.author_weights = zipf_cum_weights(len(self.author_ids))
+        return count
+
+    def seed_recipes(self, count):
+        authors = self.rng.choices(
+            self.author_ids, cum_weights=self.author_weights, k=count
+        )
+        count = bulk_insert(
+            Recipe,
+            (
+                Recipe(
+                    author_id=author_id,
+                    name=f'Рецепт {number}',
+                    text='Описание рецепта для бенчмарка.',
+                    cooking_time=self.rng.randint(5, 180),
+                    image='recipes/images/benchmark.png'
+                )
+                for number, author_id in enumerate(authors)
+            ),
+            self.batch_size
+        )
+        self.recipe_ids = list(
+            Recipe.objects.filter(
+                author__username__startswith=PREFIX
+            ).order_by('id').values_list('id', flat=True)
+        )
+        self.rng.shuffle(self.recipe_ids)
+        self.recipe_weights = zipf_cum_weights(len(self.recipe_ids))
+        return count
+
+    def seed_amounts(self, _):
+        return bulk_insert(
+            IngredientAmount,
+            (
+                IngredientAmount(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500)
+                )
+                for recipe_id in self.recipe_ids
+                for ingredient_id in self.rng.sample(
+                    self.ingredient_ids,
+                    min(len(self.ingredient_ids), self.rng.randint(3, 12))
+                )
+            ),
+            self.batch_size
+        )
+
+    def seed_recipe_tags(self, _):
+        through = Recipe.tags.through
+        return bulk_insert(
+            through,
+            (
+                through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in self.recipe_ids
+                for tag_id in self.rng.sample(
+                    self.tag_ids,
+                    min(len(self.tag_ids), self.rng.randint(1, 3))
+                )
+            ),
+            self.batch_size
+        )
+
+    def seed_follows(self, _):
+        return bulk_insert(
+            Follow,
+            (
+                Follow(user_id=user_id, following_id=author_id)
+                for user_id in self.user_ids
+                for author_id in sample_distinct(
+                    self.rng, self.author_ids, self.author_weights,
+                    heavy_tail(
+                        self.rng, FOLLOWS_PER_USER, len(self.author_ids) // 2
+                    ),
+                    exclude=user_id
+                )
+            ),
+            self.batch_size
+        )
+
+    def seed_relations(self, model, mean):
+        now = timezone.now()
+        return bulk_insert(
+            model,
+            (
+                model(
+                    user_id=user_id, recipe_id=recipe_id,
+                    created=now - timedelta(
+                        days=self.rng.random() * HISTORY_DAYS
+                    )
+                )
+                for user_id in self.user_ids
+                for recipe_id in sample_distinct(
+                    self.rng, self.recipe_ids, self.recipe_weights,
+                    heavy_tail(self.rng, mean, len(self.recipe_ids) // 2)
+                )
+            ),
+            self.batch_size
+        )
+
+    def seed_favorites(self, _):
+        return self.seed_relations(FavoriteRecipe, FAVORITES_PER_USER)
+
+    def seed_carts(self, _):
+        return self.seed_relations(ShoppingCart, CART_PER_USER)
+
+    def seed_shopping_lists(self, _):
+        # bulk_create обходит сигналы корзины: суммы считаются заново.
+        for batch in chunks(self.user_ids, REBUILD_BATCH_SIZE):
+            rebuild(batch)
+        return ShoppingListItem.objects.filter(
+            user__username__startswith=PREFIX
+        ).count()
+
+    def seed_feeds(self, _):
+        """Ленты подписчиков, как их разложил бы fan_out."""
+        cache.delete(CELEBRITIES_KEY)
+        celebrities = celebrity_ids()
+        recipes = defaultdict(list)
+        for recipe_id, author_id, pub_date in Recipe.objects.filter(
+            author__username__startswith=PREFIX
+        ).values_list('id', 'author_id', 'pub_date').iterator():
+            recipes[author_id].append((recipe_id, pub_date))
+        return bulk_insert(
+            FeedEntry,
+            (
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id, pub_date=pub_date
+                )
+                for user_id, author_id in Follow.objects.filter(
+                    user__username__startswith=PREFIX
+                ).exclude(
+                    following_id__in=celebrities
+                ).values_list('user_id', 'following_id').iterator()
+                for recipe_id, pub_date in recipes[author_id]
+            ),
+            self.batch_size
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.deletion import sweep_files
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок рецептов старше MEDIA_DELETE_GRACE_SECONDS, '
+        'на которые не ссылается ни один рецепт. Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        checked, deleted = sweep_files(Recipe, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {checked}, удалено: {deleted}.'
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2026-10-19 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='viewed',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Последняя запись просмотров'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='views',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Просмотры'),
+        ),
+    ]
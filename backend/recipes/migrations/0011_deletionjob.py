@@ -0,0 +1,42 @@
+# Generated by Django 3.2.16 on 2026-10-19 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Модель')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Удаляется'), ('done', 'Удален'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('deleted_rows', models.BigIntegerField(default=0, verbose_name='Удалено строк')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+            ],
+            options={
+                'verbose_name': 'Фоновое удаление',
+                'verbose_name_plural': 'Фоновые удаления',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='deleted',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Удален'),
+        ),
+        migrations.AddIndex(
+            model_name='deletionjob',
+            index=models.Index(fields=['status', 'created'], name='recipes_del_status_31f02a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletionjob',
+            index=models.Index(fields=['model', 'object_id'], name='recipes_del_model_5e3703_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.16 on 2026-10-19 12:35
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_changes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeTombstone = apps.get_model('recipes', 'RecipeTombstone')
+    Recipe.objects.update(updated=F('pub_date'))
+    RecipeTombstone.objects.bulk_create(
+        (
+            RecipeTombstone(recipe_id=recipe_id, deleted=deleted)
+            for recipe_id, deleted in Recipe.objects.filter(
+                deleted__isnull=False
+            ).values_list('id', 'deleted').iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_deletionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeTombstone',
+            fields=[
+                ('recipe_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='id рецепта')),
+                ('deleted', models.DateTimeField(verbose_name='Удален')),
+            ],
+            options={
+                'verbose_name': 'Удаленный рецепт',
+                'verbose_name_plural': 'Удаленные рецепты',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменен'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated', 'id'], name='recipe_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='recipetombstone',
+            index=models.Index(fields=['deleted', 'recipe_id'], name='tombstone_deleted'),
+        ),
+        migrations.RunPython(fill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-19 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletionjob',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Воркер активен'),
+        ),
+    ]
@@ -1,6 +1,10 @@
+import uuid
+
 from colorfield.fields import ColorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
+from foodgram.storage import ContentAddressedStorage
 from users.models import User
 
 
@@ -50,6 +54,13 @@ class Ingredient(models.Model):
         return f"{self.name} ({self.measurement_unit})"
 
 
+class RecipeManager(models.Manager):
+    """Рецепты без поставленных в очередь на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted__isnull=True)
+
+
 class Recipe(models.Model):
     """Рецепт."""
 
@@ -71,10 +82,14 @@ class Recipe(models.Model):
             MinValueValidator(1)
         ]
     )
+    # Файлы по хешу содержимого, общие для рецептов с одной картинкой;
+    # индекс — для проверки ссылок перед удалением файла.
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='recipes/images/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True
     )
     tags = models.ManyToManyField(
         Tag,
@@ -91,10 +106,45 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    # Позиция изменений для синхронизации клиентов, см. recipes.sync.
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменен'
+    )
+    # Пишутся пачками из recipes.view_counts, без save().
+    views = models.PositiveBigIntegerField(
+        verbose_name='Просмотры',
+        default=0
+    )
+    viewed = models.DateTimeField(
+        verbose_name='Последняя запись просмотров',
+        null=True,
+        blank=True,
+        db_index=True
+    )
+    # Рецепт скрыт и ждет удаления в фоне, см. recipes.deletion.
+    deleted = models.DateTimeField(
+        verbose_name='Удален',
+        null=True,
+        blank=True,
+        db_index=True
+    )
+
+    objects = RecipeManager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date'
+            ),
+            models.Index(
+                fields=('updated', 'id'),
+                name='recipe_updated'
+            ),
+        )
 
     def __str__(self):
         return f"{self.name} {self.author.first_name}"
@@ -142,6 +192,11 @@ class FavoriteRecipe(models.Model):
         verbose_name='Пользователь',
         related_name='favorite_users'
     )
+    created = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         verbose_name = 'Избранный рецепт'
@@ -166,6 +221,11 @@ class ShoppingCart(models.Model):
         verbose_name='Покупка',
         related_name='shopping_carts_recipes'
     )
+    created = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         verbose_name = 'Рецепт в списке покупок'
@@ -173,3 +233,330 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"{self.recipe.name} {self.user.username}"
+
+
+class ShoppingListItem(models.Model):
+    """Строка списка покупок, материализованная по корзине пользователя.
+
+    Поддерживается recipes.shopping_list при изменении корзины
+    и ингредиентов рецептов из нее.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list_items'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='shopping_list_items'
+    )
+    amount = models.FloatField(
+        verbose_name='Количество',
+        default=0
+    )
+    recipes = models.IntegerField(
+        verbose_name='Строк рецептов в корзине',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списков покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.user.username} {self.ingredient.name}"
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика автора.
+
+    Дата публикации копируется из рецепта, чтобы лента читалась
+    одним проходом по индексу (user, pub_date).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_entry_user_pub_date'
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.user.username} {self.recipe.name}"
+
+
+class RecipeRanking(models.Model):
+    """Рейтинги рецепта, пересчитываемые командой refresh_rankings.
+
+    trending — двоичный логарифм суммы добавлений, каждое из которых
+    весит вдвое больше добавления на TRENDING_HALF_LIFE_DAYS раньше.
+    Порядок по нему со временем не меняется, поэтому пересчитываются
+    только рецепты с новыми добавлениями.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='ranking'
+    )
+    favorites = models.IntegerField(
+        verbose_name='В избранном',
+        default=0
+    )
+    carts = models.IntegerField(
+        verbose_name='В списках покупок',
+        default=0
+    )
+    popular = models.FloatField(
+        verbose_name='Популярность',
+        default=0
+    )
+    trending = models.FloatField(
+        verbose_name='Тренд',
+        null=True
+    )
+    updated = models.DateTimeField(
+        verbose_name='Пересчитан',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(fields=('-popular',), name='ranking_popular'),
+            models.Index(fields=('-trending',), name='ranking_trending'),
+        )
+
+    def __str__(self):
+        return f"{self.recipe_id} {self.popular} {self.trending}"
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт, найденный командой build_similar_recipes."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='similar_recipes'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+        related_name='+'
+    )
+    score = models.FloatField(
+        verbose_name='Сходство'
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score'
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.recipe_id} {self.similar_id} {self.score}"
+
+
+class ShoppingListJob(models.Model):
+    """Фоновая сборка PDF списка покупок."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Собирается'),
+        (DONE, 'Готов'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list_jobs'
+    )
+    cart_hash = models.CharField(
+        verbose_name='Отпечаток списка',
+        max_length=40
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING
+    )
+    file = models.FileField(
+        verbose_name='Файл',
+        upload_to='shopping_lists/',
+        blank=True
+    )
+    created = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True
+    )
+    # Ставится воркером при взятии задачи, по нему
+    # run_shopping_list_jobs находит брошенные сборки.
+    started = models.DateTimeField(
+        verbose_name='Начата',
+        null=True,
+        blank=True
+    )
+    finished = models.DateTimeField(
+        verbose_name='Завершена',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Сборка списка покупок'
+        verbose_name_plural = 'Сборки списков покупок'
+        indexes = (
+            models.Index(fields=('status', 'created')),
+            models.Index(fields=('user', 'cart_hash')),
+        )
+
+    def __str__(self):
+        return f"{self.user.username} {self.status}"
+
+
+class DeletionJob(models.Model):
+    """Фоновое удаление объекта с зависимыми строками."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Удаляется'),
+        (DONE, 'Удален'),
+        (FAILED, 'Ошибка'),
+    )
+
+    model = models.CharField(
+        verbose_name='Модель',
+        max_length=100
+    )
+    object_id = models.BigIntegerField(
+        verbose_name='id объекта'
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING
+    )
+    deleted_rows = models.BigIntegerField(
+        verbose_name='Удалено строк',
+        default=0
+    )
+    created = models.DateTimeField(
+        verbose_name='Создано',
+        auto_now_add=True
+    )
+    # Ставится при взятии задачи и обновляется воркером по ходу
+    # удаления, по нему run_deletion_jobs находит брошенные задачи.
+    heartbeat = models.DateTimeField(
+        verbose_name='Воркер активен',
+        null=True,
+        blank=True
+    )
+    finished = models.DateTimeField(
+        verbose_name='Завершено',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Фоновое удаление'
+        verbose_name_plural = 'Фоновые удаления'
+        indexes = (
+            models.Index(fields=('status', 'created')),
+            models.Index(fields=('model', 'object_id')),
+        )
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} {self.status}"
+
+
+class RecipeTombstone(models.Model):
+    """Удаленный рецепт, о котором узнают синхронизирующиеся клиенты."""
+
+    recipe_id = models.BigIntegerField(
+        verbose_name='id рецепта',
+        primary_key=True
+    )
+    deleted = models.DateTimeField(
+        verbose_name='Удален'
+    )
+
+    class Meta:
+        verbose_name = 'Удаленный рецепт'
+        verbose_name_plural = 'Удаленные рецепты'
+        indexes = (
+            models.Index(
+                fields=('deleted', 'recipe_id'),
+                name='tombstone_deleted'
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.recipe_id} {self.deleted}"
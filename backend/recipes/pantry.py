@@ -0,0 +1,263 @@
+"""Поиск рецептов по имеющимся ингредиентам.
+
+Инвертированный индекс в памяти процесса. Рецепты пронумерованы
+подряд, ингредиенту соответствует битовая маска его рецептов (целое
+Python), число ингредиентов рецепта хранится побитно в масках-разрядах.
+Запрос складывает маски переданных ингредиентов в такие же разряды,
+вычитает их из размеров рецептов и выбирает рецепты, где недостает
+0, 1, ... ингредиентов, — все операции над целыми масками сразу.
+"""
+import heapq
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Max
+
+from recipes.models import IngredientAmount
+
+# Запас по id при инкрементальной синхронизации: строки транзакций,
+# закоммиченных позже транзакций с большими id.
+ID_MARGIN = 1000
+# Номера единичных битов для каждого значения байта.
+BYTE_BITS = tuple(
+    tuple(bit for bit in range(8) if value >> bit & 1)
+    for value in range(256)
+)
+MAX_SIZE = 255
+
+
+def bit_positions(mask):
+    """Номера единичных битов маски по возрастанию."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for index, value in enumerate(data):
+        if value:
+            for bit in BYTE_BITS[value]:
+                yield index * 8 + bit
+
+
+def add_mask(planes, mask):
+    """Прибавляет по единице в позициях mask к побитовым счетчикам."""
+    for digit, plane in enumerate(planes):
+        planes[digit], mask = plane ^ mask, plane & mask
+        if not mask:
+            return
+    planes.append(mask)
+
+
+def subtract(minuend, subtrahend, full):
+    """Побитовая разность счетчиков, уменьшаемое не меньше вычитаемого."""
+    result, borrow = [], 0
+    for digit in range(max(len(minuend), len(subtrahend))):
+        left = minuend[digit] if digit < len(minuend) else 0
+        right = subtrahend[digit] if digit < len(subtrahend) else 0
+        result.append(left ^ right ^ borrow)
+        borrow = ((left ^ full) & (right | borrow)) | (right & borrow)
+    return result
+
+
+def equal_to(planes, value, full):
+    """Маска позиций, где счетчик равен value."""
+    if value >> len(planes):
+        return 0
+    mask = full
+    for digit, plane in enumerate(planes):
+        mask &= plane if value >> digit & 1 else plane ^ full
+    return mask
+
+
+class PantryIndex:
+    """Индекс ингредиент -> рецепты.
+
+    Перестраивается целиком раз в PANTRY_REBUILD_SECONDS, а между
+    перестройками не чаще раза в PANTRY_SYNC_SECONDS подтягивает
+    рецепты с новыми строками IngredientAmount: RecipeSerializer
+    пересоздает их при каждом изменении рецепта. Удаленные рецепты
+    остаются в индексе до перестройки, вьюха их отбрасывает.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._ids = array('q')
+        self._positions = {}
+        self._ingredients = []
+        self._sizes = array('B')
+        self._size_planes = []
+        self._postings = {}
+        self._last_id = None
+        self._seen_ids = set()
+        self._next_sync = 0
+        self._next_rebuild = 0
+
+    def build(self, pairs):
+        """Индекс по парам (рецепт, ингредиент)."""
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in pairs:
+            recipes[recipe_id].add(ingredient_id)
+        ids = array('q', sorted(recipes))
+        length = (len(ids) + 7) // 8
+        postings = defaultdict(lambda: bytearray(length))
+        sizes = array('B')
+        for position, recipe_id in enumerate(ids):
+            byte, bit = divmod(position, 8)
+            for ingredient_id in recipes[recipe_id]:
+                postings[ingredient_id][byte] |= 1 << bit
+            sizes.append(min(len(recipes[recipe_id]), MAX_SIZE))
+        size_planes = []
+        for position, size in enumerate(sizes):
+            for digit in range(size.bit_length()):
+                if size >> digit & 1:
+                    while len(size_planes) <= digit:
+                        size_planes.append(bytearray(length))
+                    size_planes[digit][position // 8] |= 1 << position % 8
+        with self._lock:
+            self._ids = ids
+            self._positions = {
+                recipe_id: position for position, recipe_id in enumerate(ids)
+            }
+            self._ingredients = [tuple(recipes[pk]) for pk in ids]
+            self._sizes = sizes
+            self._size_planes = [
+                int.from_bytes(plane, 'little') for plane in size_planes
+            ]
+            self._postings = {
+                ingredient_id: int.from_bytes(mask, 'little')
+                for ingredient_id, mask in postings.items()
+            }
+
+    def replace(self, recipe_id, ingredients):
+        """Заменяет ингредиенты рецепта в индексе."""
+        with self._lock:
+            position = self._positions.get(recipe_id)
+            if position is None:
+                if not ingredients:
+                    return
+                position = len(self._ids)
+                self._ids.append(recipe_id)
+                self._positions[recipe_id] = position
+                self._ingredients.append(())
+                self._sizes.append(0)
+            bit = 1 << position
+            old = set(self._ingredients[position])
+            for ingredient_id in old - ingredients:
+                self._postings[ingredient_id] &= ~bit
+            for ingredient_id in ingredients - old:
+                self._postings[ingredient_id] = (
+                    self._postings.get(ingredient_id, 0) | bit
+                )
+            self._ingredients[position] = tuple(ingredients)
+            size = min(len(ingredients), MAX_SIZE)
+            self._sizes[position] = size
+            while len(self._size_planes) < size.bit_length():
+                self._size_planes.append(0)
+            for digit, plane in enumerate(self._size_planes):
+                self._size_planes[digit] = (
+                    plane | bit if size >> digit & 1 else plane & ~bit
+                )
+
+    def discard(self, recipe_ids):
+        for recipe_id in recipe_ids:
+            self.replace(recipe_id, set())
+
+    def search(self, ingredients, max_missing):
+        """[(недостает, -есть, рецепт)] от полностью покрытых рецептов."""
+        with self._lock:
+            masks = [
+                self._postings[ingredient_id]
+                for ingredient_id in set(ingredients)
+                if ingredient_id in self._postings
+            ]
+            size_planes = list(self._size_planes)
+            sizes, ids = self._sizes, self._ids
+            full = (1 << len(ids)) - 1
+        found, counts = 0, []
+        for mask in masks:
+            found |= mask
+            add_mask(counts, mask)
+        missing_planes = subtract(size_planes, counts, full)
+        results, limit = [], settings.PANTRY_MAX_RESULTS
+        for missing in range(max_missing + 1):
+            rows = [
+                (missing, missing - sizes[position], ids[position])
+                for position in bit_positions(
+                    found & equal_to(missing_planes, missing, full)
+                )
+            ]
+            results.extend(heapq.nsmallest(limit - len(results), rows))
+            if len(results) >= limit:
+                break
+        return results
+
+    def rebuild(self):
+        # Позиция синхронизации читается до построения: строки,
+        # добавленные во время него, подтянет следующий sync.
+        last_id = IngredientAmount.objects.aggregate(
+            last=Max('id')
+        )['last'] or 0
+        seen_ids = set(IngredientAmount.objects.filter(
+            id__gt=last_id - ID_MARGIN
+        ).values_list('id', flat=True))
+        self.build(
+            IngredientAmount.objects.values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator(chunk_size=10000)
+        )
+        self._seen_ids = seen_ids
+        self._last_id = last_id
+
+    def sync(self):
+        rows = dict(IngredientAmount.objects.filter(
+            id__gt=self._last_id - ID_MARGIN
+        ).values_list('id', 'recipe_id'))
+        changed = {
+            recipe_id for row_id, recipe_id in rows.items()
+            if row_id not in self._seen_ids
+        }
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in IngredientAmount.objects.filter(
+            recipe_id__in=changed
+        ).values_list('recipe_id', 'ingredient_id'):
+            recipes[recipe_id].add(ingredient_id)
+        for recipe_id in changed:
+            self.replace(recipe_id, recipes[recipe_id])
+        self._seen_ids = set(rows)
+        self._last_id = max(rows, default=self._last_id)
+
+    def refresh(self):
+        """Перестройка или синхронизация, если пришло их время."""
+        now = time.monotonic()
+        if self._last_id is None:
+            # Первый запрос процесса ждет построения индекса.
+            with self._build_lock:
+                if self._last_id is None:
+                    self.rebuild()
+                    self._next_rebuild = (
+                        now + settings.PANTRY_REBUILD_SECONDS
+                    )
+                    self._next_sync = now + settings.PANTRY_SYNC_SECONDS
+            return
+        with self._lock:
+            rebuild = now >= self._next_rebuild
+            sync = now >= self._next_sync
+            if rebuild:
+                self._next_rebuild = now + settings.PANTRY_REBUILD_SECONDS
+            if rebuild or sync:
+                self._next_sync = now + settings.PANTRY_SYNC_SECONDS
+        if not (rebuild or sync) or not self._build_lock.acquire(False):
+            return
+        try:
+            if rebuild:
+                self.rebuild()
+            else:
+                self.sync()
+        except Exception:
+            self._next_sync = self._next_rebuild = 0
+            raise
+        finally:
+            self._build_lock.release()
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,119 @@
+"""Рейтинги рецептов popular и trending.
+
+Считаются пакетно: по каждой из таблиц FavoriteRecipe и ShoppingCart
+один GROUP BY по рецепту для popular и один по рецепту и дню
+добавления за последние TRENDING_WINDOW_DAYS для trending. В popular
+входят и просмотры рецепта с весом RANKING_VIEW_WEIGHT.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from recipes.models import (FavoriteRecipe, Recipe, RecipeRanking,
+                            ShoppingCart)
+from recipes.shopping_list import chunks
+
+# Точка отсчета для trending: вес добавления — 2 ** (дней от нее
+# / период полураспада), в БД хранится логарифм суммы.
+TRENDING_EPOCH = datetime(2024, 1, 1).date()
+BATCH_SIZE = 5000
+
+
+def weights():
+    return (
+        (FavoriteRecipe, 'favorites', 1),
+        (ShoppingCart, 'carts', settings.RANKING_CART_WEIGHT),
+    )
+
+
+def log2_sum(terms):
+    """log2(сумма n * 2 ** power) без переполнения float."""
+    top = max(power for _, power in terms)
+    return top + math.log2(sum(n * 2 ** (power - top) for n, power in terms))
+
+
+def compute(recipe_ids=None):
+    """{рецепт: поля RecipeRanking} для рецептов или для всех."""
+    since = timezone.now() - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    rankings = defaultdict(lambda: {
+        'favorites': 0, 'carts': 0, 'popular': 0, 'trending': None
+    })
+    terms = defaultdict(list)
+    for model, field, weight in weights():
+        events = model.objects.all()
+        if recipe_ids is not None:
+            events = events.filter(recipe_id__in=recipe_ids)
+        for row in events.values('recipe').annotate(
+            count=Count('id')
+        ).order_by():
+            ranking = rankings[row['recipe']]
+            ranking[field] = row['count']
+            ranking['popular'] += weight * row['count']
+        for row in events.filter(
+            created__gte=since
+        ).annotate(day=TruncDate('created')).values(
+            'recipe', 'day'
+        ).annotate(count=Count('id')).order_by():
+            terms[row['recipe']].append((
+                weight * row['count'],
+                (row['day'] - TRENDING_EPOCH).days
+                / settings.TRENDING_HALF_LIFE_DAYS
+            ))
+    viewed = Recipe.objects.filter(views__gt=0)
+    if recipe_ids is not None:
+        viewed = viewed.filter(id__in=recipe_ids)
+    for recipe_id, views in viewed.values_list('id', 'views'):
+        rankings[recipe_id]['popular'] += (
+            settings.RANKING_VIEW_WEIGHT * views
+        )
+    for recipe_id, recipe_terms in terms.items():
+        rankings[recipe_id]['trending'] = log2_sum(recipe_terms)
+    return rankings
+
+
+def save(rankings, recipe_ids=None):
+    """Записывает рейтинги, удаляя прежние строки этих рецептов.
+
+    Без recipe_ids заменяется вся таблица.
+    """
+    with transaction.atomic():
+        stale = RecipeRanking.objects.all()
+        if recipe_ids is not None:
+            stale = stale.filter(recipe_id__in=recipe_ids)
+        stale.delete()
+        for batch in chunks(rankings.items(), BATCH_SIZE):
+            RecipeRanking.objects.bulk_create(
+                RecipeRanking(recipe_id=recipe_id, **fields)
+                for recipe_id, fields in batch
+            )
+    return len(rankings)
+
+
+def changed_recipes(since):
+    """Рецепты с добавлениями или просмотрами после since."""
+    recipe_ids = set(
+        Recipe.objects.filter(viewed__gte=since).values_list('id', flat=True)
+    )
+    for model, _, _ in weights():
+        recipe_ids.update(
+            model.objects.filter(created__gte=since).values_list(
+                'recipe_id', flat=True
+            ).distinct()
+        )
+    return recipe_ids
+
+
+def refresh(since=None):
+    """Полный пересчет или только рецептов, измененных после since."""
+    if since is None:
+        return save(compute())
+    return sum(
+        save(compute(batch), batch)
+        for batch in chunks(changed_recipes(since), BATCH_SIZE)
+    )
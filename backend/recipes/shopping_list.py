@@ -0,0 +1,243 @@
+"""Материализованные списки покупок.
+
+ShoppingListItem хранит для пользователя сумму ингредиента по всем
+рецептам корзины и число строк рецептов, из которых она сложилась.
+Корзина меняет строки через сигналы (recipes/apps.py), пакетные
+изменения корзины — через add_recipes и remove_recipes, изменение
+ингредиентов рецепта — RecipeSerializer.update и IngredientAmountAdmin.
+Строки с нулевым счетчиком не удаляются на горячем пути, чтобы не
+терять параллельные добавления, их убирает команда
+rebuild_shopping_lists.
+"""
+import itertools
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import (Case, Count, F, FloatField, IntegerField, Sum,
+                              Value, When)
+
+from recipes.models import IngredientAmount, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 1000
+# Допустимое расхождение сумм при проверке: суммы копятся
+# сложением и вычитанием float.
+TOLERANCE = 1e-6
+
+
+def chunks(items, size=BATCH_SIZE):
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def amounts_of(amounts):
+    """{ингредиент: (количество, строк)} по строкам IngredientAmount."""
+    result = {}
+    for row in amounts:
+        amount, rows = result.get(row.ingredient_id, (0, 0))
+        result[row.ingredient_id] = (amount + row.amount, rows + 1)
+    return result
+
+
+def recipe_amounts(recipe_id):
+    return amounts_of(
+        IngredientAmount.objects.filter(recipe_id=recipe_id).only(
+            'ingredient_id', 'amount'
+        )
+    )
+
+
+def recipes_amounts(recipe_counts):
+    """amounts_of по {рецепт: строк в корзине} одним запросом."""
+    result = {}
+    for row in IngredientAmount.objects.filter(
+        recipe_id__in=recipe_counts
+    ).only('recipe_id', 'ingredient_id', 'amount'):
+        factor = recipe_counts[row.recipe_id]
+        amount, rows = result.get(row.ingredient_id, (0, 0))
+        result[row.ingredient_id] = (
+            amount + row.amount * factor, rows + factor
+        )
+    return result
+
+
+def carting_users(recipe_id):
+    """Пользователи с рецептом в корзине, повторно — за каждую строку."""
+    return list(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True
+        )
+    )
+
+
+def apply_delta(user_ids, delta):
+    """Прибавляет delta {ингредиент: (количество, строк)} пользователям.
+
+    На каждую порцию пользователей — вставка недостающих строк
+    и один UPDATE, счетчики меняются в БД, без чтения.
+    """
+    delta = {
+        ingredient_id: change for ingredient_id, change in delta.items()
+        if any(change)
+    }
+    if not delta:
+        return
+    by_factor = {}
+    for user_id, factor in Counter(user_ids).items():
+        by_factor.setdefault(factor, []).append(user_id)
+    adding = any(rows > 0 for _, rows in delta.values())
+    for factor, users in by_factor.items():
+        amount = Case(
+            *(
+                When(
+                    ingredient_id=ingredient_id,
+                    recipes__lte=-rows * factor,
+                    then=Value(0.0)
+                )
+                for ingredient_id, (_, rows) in delta.items()
+            ),
+            *(
+                When(
+                    ingredient_id=ingredient_id,
+                    then=F('amount') + Value(value * factor)
+                )
+                for ingredient_id, (value, _) in delta.items()
+            ),
+            default=F('amount'),
+            output_field=FloatField()
+        )
+        recipes = Case(
+            *(
+                When(
+                    ingredient_id=ingredient_id,
+                    then=F('recipes') + Value(rows * factor)
+                )
+                for ingredient_id, (_, rows) in delta.items()
+            ),
+            default=F('recipes'),
+            output_field=IntegerField()
+        )
+        for batch in chunks(users):
+            with transaction.atomic(savepoint=False):
+                if adding:
+                    ShoppingListItem.objects.bulk_create(
+                        (
+                            ShoppingListItem(
+                                user_id=user_id, ingredient_id=ingredient_id
+                            )
+                            for user_id in batch for ingredient_id in delta
+                        ),
+                        ignore_conflicts=True
+                    )
+                ShoppingListItem.objects.filter(
+                    user_id__in=batch, ingredient_id__in=delta
+                ).update(amount=amount, recipes=recipes)
+
+
+def scale(amounts, factor):
+    return {
+        ingredient_id: (amount * factor, rows * factor)
+        for ingredient_id, (amount, rows) in amounts.items()
+    }
+
+
+def add_recipe(user_id, recipe_id):
+    apply_delta([user_id], recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    apply_delta([user_id], scale(recipe_amounts(recipe_id), -1))
+
+
+def add_recipes(user_id, recipe_counts):
+    """Добавление в корзину пачки рецептов одним apply_delta."""
+    apply_delta([user_id], recipes_amounts(recipe_counts))
+
+
+def remove_recipes(user_id, recipe_counts):
+    apply_delta([user_id], scale(recipes_amounts(recipe_counts), -1))
+
+
+def cart_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_recipe(instance.user_id, instance.recipe_id)
+
+
+def cart_deleting(sender, instance, using, **kwargs):
+    """pre_delete строки корзины: вычитает рецепт, если строка еще есть.
+
+    Сборщик удаляет в транзакции, поэтому строка блокируется до
+    коммита, а параллельное удаление той же строки ждет и, не найдя
+    ее, список не меняет. При каскадном удалении рецепта его
+    ингредиенты еще на месте.
+    """
+    if not ShoppingCart.objects.using(using).select_for_update().filter(
+        pk=instance.pk
+    ).values_list('pk', flat=True):
+        return
+    remove_recipe(instance.user_id, instance.recipe_id)
+
+
+def change_recipe(user_ids, old, new):
+    """Переносит в списки смену ингредиентов рецепта с old на new."""
+    delta = scale(old, -1)
+    for ingredient_id, (amount, rows) in new.items():
+        old_amount, old_rows = delta.get(ingredient_id, (0, 0))
+        delta[ingredient_id] = (old_amount + amount, old_rows + rows)
+    apply_delta(user_ids, delta)
+
+
+def expected_items(user_ids):
+    """Строки списков, посчитанные заново по корзинам."""
+    return {
+        (row['recipe__shopping_carts_recipes__user'], row['ingredient']): (
+            row['total'], row['rows']
+        )
+        for row in IngredientAmount.objects.filter(
+            recipe__shopping_carts_recipes__user__in=user_ids
+        ).values(
+            'recipe__shopping_carts_recipes__user', 'ingredient'
+        ).annotate(
+            total=Sum('amount'), rows=Count('id')
+        ).order_by()
+    }
+
+
+def stored_items(user_ids):
+    return {
+        (row['user'], row['ingredient']): (row['amount'], row['recipes'])
+        for row in ShoppingListItem.objects.filter(
+            user__in=user_ids, recipes__gt=0
+        ).values('user', 'ingredient', 'amount', 'recipes')
+    }
+
+
+def mismatches(user_ids):
+    """Расхождения (ключ, ожидалось, хранится) для пользователей."""
+    expected = expected_items(user_ids)
+    stored = stored_items(user_ids)
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key)
+        have = stored.get(key)
+        if (
+            want is None or have is None or want[1] != have[1]
+            or abs(want[0] - have[0]) > TOLERANCE
+        ):
+            yield key, want, have
+
+
+def rebuild(user_ids):
+    """Пересобирает списки пользователей и убирает нулевые строки."""
+    with transaction.atomic():
+        ShoppingListItem.objects.filter(user__in=user_ids).delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id,
+                amount=amount, recipes=rows
+            )
+            for (user_id, ingredient_id), (amount, rows)
+            in expected_items(user_ids).items()
+        )
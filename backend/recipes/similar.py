@@ -0,0 +1,114 @@
+"""Похожие рецепты по совместным добавлениям и общим ингредиентам.
+
+Матрицы пользователь × рецепт (избранное и списки покупок) и рецепт ×
+ингредиент хранятся разреженно, словарями множеств в обе стороны.
+Сходство — косинусное по каждой матрице, смешанное с весом
+SIMILAR_INTERACTIONS_WEIGHT. Кандидаты для рецепта берутся через
+строки его пользователей и ингредиентов, поэтому пользователи и
+ингредиенты с очень длинными строками пропускаются.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import (FavoriteRecipe, IngredientAmount, Recipe,
+                            ShoppingCart, SimilarRecipe)
+from recipes.shopping_list import chunks
+
+
+def load_matrix(querysets, row_limit):
+    """Разреженная матрица (строки -> столбцы, столбцы -> строки).
+
+    Строки длиннее row_limit отбрасываются целиком.
+    """
+    rows = defaultdict(set)
+    for queryset in querysets:
+        for row, column in queryset.iterator(chunk_size=10000):
+            rows[row].add(column)
+    rows = {
+        row: row_columns for row, row_columns in rows.items()
+        if len(row_columns) <= row_limit
+    }
+    columns = defaultdict(set)
+    for row, row_columns in rows.items():
+        for column in row_columns:
+            columns[column].add(row)
+    return rows, columns
+
+
+def cosine(recipe_id, recipe_rows, row_recipes):
+    """{рецепт: косинусное сходство с recipe_id} по общим строкам."""
+    rows = recipe_rows.get(recipe_id)
+    if not rows:
+        return {}
+    common = Counter()
+    for row in rows:
+        common.update(row_recipes[row])
+    del common[recipe_id]
+    return {
+        other: count / math.sqrt(len(rows) * len(recipe_rows[other]))
+        for other, count in common.items()
+    }
+
+
+class Similarity:
+    """Сходство рецептов по загруженным матрицам."""
+
+    def __init__(self):
+        self.user_recipes, self.recipe_users = load_matrix(
+            (
+                model.objects.values_list('user_id', 'recipe_id')
+                for model in (FavoriteRecipe, ShoppingCart)
+            ),
+            settings.SIMILAR_MAX_USER_RECIPES
+        )
+        self.ingredient_recipes, self.recipe_ingredients = load_matrix(
+            (
+                IngredientAmount.objects.values_list(
+                    'ingredient_id', 'recipe_id'
+                ),
+            ),
+            settings.SIMILAR_MAX_INGREDIENT_RECIPES
+        )
+
+    def neighbors(self, recipe_id, k):
+        """k самых похожих рецептов: [(сходство, рецепт)]."""
+        weight = settings.SIMILAR_INTERACTIONS_WEIGHT
+        scores = Counter()
+        for other, score in cosine(
+            recipe_id, self.recipe_users, self.user_recipes
+        ).items():
+            scores[other] += weight * score
+        for other, score in cosine(
+            recipe_id, self.recipe_ingredients, self.ingredient_recipes
+        ).items():
+            scores[other] += (1 - weight) * score
+        return heapq.nlargest(
+            k, ((score, other) for other, score in scores.items())
+        )
+
+
+def build(chunk_size=1000, k=None):
+    """Пересчитывает SimilarRecipe порциями рецептов.
+
+    Каждая порция заменяется в своей транзакции, так что при чтении
+    всегда есть прежние или новые рекомендации.
+    """
+    k = k or settings.SIMILAR_RECIPES_K
+    similarity = Similarity()
+    total = 0
+    recipe_ids = Recipe.objects.order_by('id').values_list('id', flat=True)
+    for batch in chunks(recipe_ids.iterator(), chunk_size):
+        rows = [
+            SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+            for recipe_id in batch
+            for score, other in similarity.neighbors(recipe_id, k)
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+            SimilarRecipe.objects.bulk_create(rows)
+        total += len(rows)
+    return total
@@ -0,0 +1,118 @@
+"""Изменения рецептов для фоновой синхронизации клиентов.
+
+Позиция синхронизации — время и id последнего отданного изменения.
+Измененные рецепты берутся по Recipe.updated (его обновляют save() и
+touch() при правке ингредиентов в админке), удаленные — по
+RecipeTombstone, который пишет recipes.deletion.schedule. Оба потока
+упорядочены по (время, id) составными индексами и сливаются в одну
+страницу. Изменения моложе SYNC_LAG_SECONDS не отдаются: транзакция,
+начатая раньше, могла еще не закоммититься, и ее строка оказалась бы
+позади уже отданной позиции.
+"""
+import heapq
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.models import Recipe, RecipeTombstone
+from recipes.shopping_list import chunks
+
+TOMBSTONE_BATCH_SIZE = 1000
+
+
+def touch(recipe_ids):
+    """Отмечает рецепты измененными без save()."""
+    Recipe._base_manager.filter(pk__in=recipe_ids).update(
+        updated=timezone.now()
+    )
+
+
+def bury(recipe_ids, deleted):
+    """Записывает надгробия удаленных рецептов."""
+    for batch in chunks(recipe_ids, TOMBSTONE_BATCH_SIZE):
+        RecipeTombstone.objects.bulk_create(
+            (
+                RecipeTombstone(recipe_id=recipe_id, deleted=deleted)
+                for recipe_id in batch
+            ),
+            ignore_conflicts=True
+        )
+
+
+def expired(position):
+    """Надгробия старше позиции могли быть удалены prune_tombstones."""
+    return position[0] < timezone.now() - timedelta(
+        days=settings.SYNC_TOMBSTONE_DAYS
+    )
+
+
+def after(queryset, time_field, id_field, position):
+    if position is None:
+        return queryset
+    moment, pk = position
+    return queryset.filter(
+        Q(**{f'{time_field}__gt': moment})
+        | Q(**{time_field: moment, f'{id_field}__gt': pk})
+    )
+
+
+def changes(recipes, position, limit):
+    """Страница изменений после position.
+
+    recipes — queryset живых рецептов. Возвращает измененные рецепты,
+    id удаленных, новую позицию и есть ли еще изменения. Без position
+    отдаются все рецепты, а надгробия пропускаются: удалять клиенту
+    нечего.
+    """
+    horizon = timezone.now() - timedelta(seconds=settings.SYNC_LAG_SECONDS)
+    changed = (
+        (recipe.updated, recipe.pk, recipe)
+        for recipe in after(
+            recipes.filter(updated__lte=horizon), 'updated', 'id', position
+        ).order_by('updated', 'id')[:limit + 1]
+    )
+    deleted = ()
+    if position is not None:
+        deleted = (
+            (moment, pk, None)
+            for moment, pk in after(
+                RecipeTombstone.objects.filter(deleted__lte=horizon),
+                'deleted', 'recipe_id', position
+            ).order_by('deleted', 'recipe_id').values_list(
+                'deleted', 'recipe_id'
+            )[:limit + 1]
+        )
+    page = list(islice(
+        heapq.merge(changed, deleted, key=lambda row: row[:2]), limit + 1
+    ))
+    more = len(page) > limit
+    page = page[:limit]
+    if page:
+        position = page[-1][:2]
+    if not more and (position is None or position[0] < horizon):
+        # Все до горизонта отдано: позиция догоняет его, чтобы у
+        # клиента без изменений она не устаревала.
+        position = (horizon, 0)
+    return (
+        [recipe for _, _, recipe in page if recipe is not None],
+        [pk for _, pk, recipe in page if recipe is None],
+        position,
+        more
+    )
+
+
+def prune_tombstones(batch_size=TOMBSTONE_BATCH_SIZE):
+    """Удаляет надгробия старше SYNC_TOMBSTONE_DAYS порциями."""
+    border = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    deleted = 0
+    while True:
+        ids = list(RecipeTombstone.objects.filter(
+            deleted__lt=border
+        ).values_list('recipe_id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        RecipeTombstone.objects.filter(recipe_id__in=ids).delete()
+        deleted += len(ids)
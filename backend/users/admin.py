@@ -1,21 +1,26 @@
 from django.contrib import admin
 
+from foodgram.admin_helpers import BackgroundDeleteAdmin, LargeTableAdmin
+
 from .models import Follow, User
 
+
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     """Подписки."""
 
     list_display = ('following', 'user')
-    list_filter = ('following__username', 'following__email', 'user')
-    search_fields = ('following__username', 'following__email', 'user')
-
+    list_select_related = ('following', 'user')
+    search_fields = (
+        'following__username', 'following__email', 'user__username'
+    )
+    autocomplete_fields = ('following', 'user')
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    """Пользователb."""
+class UserAdmin(BackgroundDeleteAdmin):
+    """Пользователь."""
 
     list_display = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('username', 'email', 'first_name', 'last_name')
+    list_filter = ('is_staff', 'is_active')
     search_fields = ('username', 'email', 'first_name', 'last_name')
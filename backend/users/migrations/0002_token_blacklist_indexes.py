@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# Таблицы simplejwt не принадлежат проекту, поэтому индексы для
+# prune_tokens (expires_at) и синхронизации отозванных токенов
+# (blacklisted_at) создаются SQL-запросом.
+INDEXES = (
+    ('token_outstanding_expires_idx',
+     'token_blacklist_outstandingtoken', 'expires_at'),
+    ('token_blacklisted_at_idx',
+     'token_blacklist_blacklistedtoken', 'blacklisted_at'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('token_blacklist', '0011_linearizes_history'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column});',
+            f'DROP INDEX IF EXISTS {name};'
+        )
+        for name, table, column in INDEXES
+    ]